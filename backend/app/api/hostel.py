@@ -3,6 +3,7 @@ Hostel API Router
 """
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_db
@@ -105,7 +106,11 @@ async def delete_block(
     return {"message": "Block deleted successfully"}
 
 
-@router.get("/blocks/{block_id}/availability", response_model=BlockAvailabilityResponse)
+@router.get(
+    "/blocks/{block_id}/availability",
+    response_model=BlockAvailabilityResponse,
+    response_class=ORJSONResponse
+)
 async def get_block_availability(
     block_id: int,
     db: AsyncSession = Depends(get_db),
@@ -447,7 +452,7 @@ async def create_hostel_fee_payment(
 
 # ==================== Analytics Endpoints ====================
 
-@router.get("/summary", response_model=HostelSummaryResponse)
+@router.get("/summary", response_model=HostelSummaryResponse, response_class=ORJSONResponse)
 async def get_hostel_summary(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
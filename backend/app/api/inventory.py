@@ -6,11 +6,12 @@ Endpoints for inventory management and stock control
 import logging
 from datetime import datetime
 from typing import List, Optional
+from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.core.security import get_current_user, require_roles
 from app.schema.inventory_schema import (
     InventoryCreate, InventoryUpdate, InventoryResponse,
@@ -36,14 +37,15 @@ async def list_inventory(
     supplier_id: Optional[str] = Query(None),
     low_stock_only: bool = Query(False),
     search: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """
     List inventory items with pagination and filtering
     
     Supports filtering by category, supplier, and low stock status.
-    Search by name, SKU, or description.
+    Search by name, SKU, or description; a trailing "*" (e.g. "STN-*")
+    matches SKUs by prefix.
     """
     service = InventoryService(db)
     items, total = await service.list_items(
@@ -90,8 +92,8 @@ async def list_inventory(
 
 @router.get("/{item_id}", response_model=InventoryResponse)
 async def get_inventory_item(
-    item_id: str,
-    db: AsyncSession = Depends(get_db),
+    item_id: UUID,
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """Get inventory item by ID"""
@@ -173,7 +175,7 @@ async def create_inventory_item(
 
 @router.patch("/{item_id}", response_model=InventoryResponse)
 async def update_inventory_item(
-    item_id: str,
+    item_id: UUID,
     data: InventoryUpdate,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin", "staff"]))
@@ -217,7 +219,7 @@ async def update_inventory_item(
 
 @router.delete("/{item_id}", response_model=MessageResponse)
 async def delete_inventory_item(
-    item_id: str,
+    item_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin"]))
 ):
@@ -238,7 +240,7 @@ async def delete_inventory_item(
 
 @router.post("/{item_id}/adjust", response_model=StockAdjustmentResult)
 async def adjust_stock(
-    item_id: str,
+    item_id: UUID,
     adjustment: StockAdjustment,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin", "staff"]))
@@ -264,26 +266,33 @@ async def adjust_stock(
 
 @router.get("/{item_id}/transactions", response_model=StockTransactionListResponse)
 async def get_item_transactions(
-    item_id: str,
-    page: int = Query(1, ge=1),
+    item_id: UUID,
     per_page: int = Query(50, ge=1, le=100),
+    cursor: Optional[datetime] = Query(None),
+    cursor_id: Optional[UUID] = Query(None),
     transaction_type: Optional[str] = Query(None),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    """Get transaction history for an inventory item"""
+    """
+    Get transaction history for an inventory item
+    
+    Newest first. Pass next_cursor/next_cursor_id from a response as
+    cursor/cursor_id to fetch the following page.
+    """
     from app.schema.inventory_schema import TransactionType
     
     service = InventoryService(db)
     
     tx_type = TransactionType(transaction_type) if transaction_type else None
     
-    transactions, total = await service.get_transactions(
+    transactions, has_next = await service.get_transactions(
         item_id=item_id,
-        page=page,
         per_page=per_page,
+        cursor=cursor,
+        cursor_id=cursor_id,
         transaction_type=tx_type,
         start_date=start_date,
         end_date=end_date
@@ -307,10 +316,10 @@ async def get_item_transactions(
             }
             for tx in transactions
         ],
-        total=total,
-        page=page,
         per_page=per_page,
-        total_pages=(total + per_page - 1) // per_page
+        has_next=has_next,
+        next_cursor=transactions[-1].timestamp if has_next else None,
+        next_cursor_id=str(transactions[-1].id) if has_next else None
     )
 
 
@@ -318,7 +327,7 @@ async def get_item_transactions(
 
 @router.get("/alerts/low-stock", response_model=List[LowStockAlert])
 async def get_low_stock_alerts(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """Get all items below reorder level"""
@@ -329,7 +338,7 @@ async def get_low_stock_alerts(
 
 @router.get("/alerts/out-of-stock", response_model=List[InventoryResponse])
 async def get_out_of_stock_items(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """Get items with zero stock"""
@@ -368,7 +377,7 @@ async def get_out_of_stock_items(
 
 @router.get("/stats/summary", response_model=InventoryStatsResponse)
 async def get_inventory_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """Get inventory statistics"""
@@ -412,7 +421,7 @@ async def create_purchase_order(
 
 @router.post("/purchase-orders/{order_id}/receive", response_model=PurchaseOrderResponse)
 async def receive_purchase_order(
-    order_id: str,
+    order_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin", "staff"]))
 ):
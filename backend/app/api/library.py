@@ -6,8 +6,10 @@ Endpoints for library management and book circulation
 import logging
 from datetime import datetime
 from typing import List, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_db
@@ -19,15 +21,17 @@ from app.schema.library_schema import (
     TransactionResponse, TransactionListResponse,
     ReservationCreate, ReservationResponse, ReservationListResponse,
     FineResponse, FineListResponse, FinePaymentRequest, FineWaiveRequest,
-    OverdueReport, LibrarySettingsResponse, LibraryStatsResponse,
+    OverdueItem, OverdueReport, LibrarySettingsResponse, LibraryStatsResponse,
     IssueReceipt, ReturnReceipt, MessageResponse
 )
-from app.services.library_service import LibraryService
+from app.services.library_service import LibraryService, OverdueItemRow
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/library", tags=["Library"])
 
+_overdue_rows_adapter = TypeAdapter(List[OverdueItemRow])
+
 
 # ==================== Book Catalog Endpoints ====================
 
@@ -93,7 +97,7 @@ async def list_books(
 
 @router.get("/books/{book_id}", response_model=BookResponse)
 async def get_book(
-    book_id: str,
+    book_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -172,7 +176,7 @@ async def create_book(
 
 @router.patch("/books/{book_id}", response_model=BookResponse)
 async def update_book(
-    book_id: str,
+    book_id: UUID,
     data: BookUpdate,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin", "librarian"]))
@@ -214,7 +218,7 @@ async def update_book(
 
 @router.delete("/books/{book_id}", response_model=MessageResponse)
 async def delete_book(
-    book_id: str,
+    book_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin", "librarian"]))
 ):
@@ -293,7 +297,7 @@ async def list_members(
 
 @router.get("/members/{member_id}", response_model=MemberResponse)
 async def get_member(
-    member_id: str,
+    member_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -448,7 +452,7 @@ async def renew_book(
 
 @router.post("/mark-lost/{transaction_id}", response_model=TransactionResponse)
 async def mark_as_lost(
-    transaction_id: str,
+    transaction_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(require_roles(["admin", "librarian"]))
 ):
@@ -587,7 +591,7 @@ async def create_reservation(
 
 @router.post("/reservations/{reservation_id}/cancel", response_model=ReservationResponse)
 async def cancel_reservation(
-    reservation_id: str,
+    reservation_id: UUID,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -683,7 +687,9 @@ async def get_overdue_report(
 ):
     """Get overdue items report"""
     service = LibraryService(db)
-    return await service.get_overdue_report()
+    rows = await service.get_overdue_report()
+    # Serialize the whole report in one pass rather than validating each row
+    return Response(content=_overdue_rows_adapter.dump_json(rows), media_type="application/json")
 
 
 @router.get("/stats/summary", response_model=LibraryStatsResponse)
@@ -3,7 +3,7 @@ Payment API endpoints
 Payment processing, history, and receipt generation
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
@@ -23,7 +23,8 @@ from app.models.models import (
 )
 from app.core.security import get_current_user, require_admin, require_staff
 from app.services.payment_service import PaymentService
-from app.services.receipt_service import ReceiptGenerator
+from app.services.receipt_service import receipt_generator
+from app.services.payment_gateway import PaymentProviderType, get_provider
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
@@ -56,6 +57,30 @@ async def process_payment(
     return result
 
 
+# ==================== Webhooks ====================
+
+@router.post("/webhook/stripe")
+async def stripe_webhook(request: Request):
+    """
+    Receive PaymentIntent events from Stripe.
+    Configure a Stripe webhook endpoint for payment_intent.* events pointing here.
+    """
+    provider = get_provider(PaymentProviderType.STRIPE)
+    
+    try:
+        await provider.handle_webhook(
+            await request.body(),
+            request.headers.get("stripe-signature", "")
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {"received": True}
+
+
 @router.get("", response_model=PaymentPaginatedResponse)
 async def get_payments(
     student_id: Optional[int] = Query(None, description="Filter by student"),
@@ -192,8 +217,7 @@ async def download_receipt(
         )
     
     # Generate PDF
-    generator = ReceiptGenerator()
-    pdf_buffer = generator.generate_receipt(
+    pdf_buffer = receipt_generator.generate_receipt(
         receipt_number=receipt_data.receipt_number,
         payment_date=receipt_data.payment_date,
         student_name=receipt_data.student_name,
@@ -4,7 +4,8 @@ Self-hosted AI integration for SchoolOps using local LLM models
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
 from enum import Enum
 import json
 import logging
@@ -49,6 +50,29 @@ class AIProvider(ABC):
         """Generate text from the AI model"""
         pass
     
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text in chunks
+        
+        Providers without native streaming yield the full generate_text
+        result as a single chunk. Raises RuntimeError if generation fails.
+        """
+        response = await self.generate_text(
+            prompt=prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        if not response.success:
+            raise RuntimeError(response.error_message or "AI generation failed")
+        yield response.content
+    
     @abstractmethod
     async def analyze_json(
         self, 
@@ -197,6 +221,49 @@ class OllamaProvider(AIProvider):
                 error_message=str(e)
             )
     
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream text from Ollama's chat API as it is generated
+        
+        Callers may stop iterating early; closing the generator closes the
+        HTTP response, which stops generation on the Ollama side.
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": {
+                "temperature": temperature,
+            }
+        }
+        
+        if max_tokens:
+            payload["options"]["num_predict"] = max_tokens
+        
+        client = await self._get_client()
+        async with client.stream("POST", f"{self.base_url}/api/chat", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                chunk = data.get("message", {}).get("content", "")
+                if chunk:
+                    yield chunk
+                if data.get("done"):
+                    break
+    
     async def analyze_json(
         self, 
         prompt: str, 
@@ -429,11 +496,15 @@ async def get_ai_provider(
 
 # Singleton instance for dependency injection
 _ai_provider: Optional[AIProvider] = None
+_ai_provider_lock = asyncio.Lock()
 
 
 async def get_ai_service() -> AIProvider:
     """Get the singleton AI provider instance"""
     global _ai_provider
     if _ai_provider is None:
-        _ai_provider = await get_ai_provider()
+        # Concurrent first callers wait for a single provider construction
+        async with _ai_provider_lock:
+            if _ai_provider is None:
+                _ai_provider = await get_ai_provider()
     return _ai_provider
@@ -0,0 +1,58 @@
+"""
+Redis Cache Client
+Shared async Redis connection for short-lived response caching
+"""
+
+import logging
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Get the shared Redis client (connections are opened lazily)"""
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def cache_get(key: str) -> Optional[str]:
+    """Read a cached value, treating Redis errors as a miss"""
+    try:
+        return await get_redis().get(key)
+    except RedisError as e:
+        logger.warning(f"Cache read failed for '{key}': {e}")
+        return None
+
+
+async def cache_set(key: str, value: str, ttl_seconds: int) -> None:
+    """Store a value with an expiry, ignoring Redis errors"""
+    try:
+        await get_redis().set(key, value, ex=ttl_seconds)
+    except RedisError as e:
+        logger.warning(f"Cache write failed for '{key}': {e}")
+
+
+async def cache_delete(*keys: str) -> None:
+    """Invalidate cached values, ignoring Redis errors"""
+    try:
+        await get_redis().delete(*keys)
+    except RedisError as e:
+        logger.warning(f"Cache invalidation failed for {keys}: {e}")
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
@@ -0,0 +1,55 @@
+"""
+Circuit Breaker
+Fail fast on calls to an external service that is down
+"""
+
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one external service
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    are rejected straight away. Once `reset_timeout` seconds have passed a
+    single probe call is let through: success closes the circuit, failure
+    keeps it open for another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.failure_threshold
+
+    def before_call(self) -> None:
+        """
+        Check that a call may go ahead
+
+        Raises:
+            CircuitOpenError: If the circuit is open and no probe is due
+        """
+        if not self.is_open:
+            return
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_timeout:
+            raise CircuitOpenError(f"{self.name} is unavailable")
+        # Let this call through as the probe; others wait out a new window
+        self._opened_at = now
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures == self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -0,0 +1,37 @@
+"""
+Client-side Rate Limiting
+Token bucket for pacing calls to rate-limited external APIs
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket shared by the coroutines calling one API
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so
+    short bursts pass straight through and sustained load is smoothed to
+    the refill rate instead of tripping the remote limit.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
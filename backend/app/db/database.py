@@ -10,13 +10,34 @@ from app.config import settings
 # Import asyncpg for better async PostgreSQL performance
 import asyncpg
 
-# Create async engine with asyncpg driver
-engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+def _create_engine(url: str, pool_size: int, max_overflow: int):
+    """Create an async engine with asyncpg driver"""
+    return create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=settings.DEBUG,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+# Primary engine for writes and read-your-writes queries
+engine = _create_engine(
+    settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+)
+
+# Read replica engine; falls back to the primary when no replica is configured
+read_engine = (
+    _create_engine(
+        settings.READ_DATABASE_URL, settings.READ_DB_POOL_SIZE, settings.READ_DB_MAX_OVERFLOW
+    )
+    if settings.READ_DATABASE_URL
+    else engine
 )
 
 # Session factory
@@ -28,6 +49,14 @@ async_session_maker = async_sessionmaker(
     autoflush=False,
 )
 
+read_session_maker = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -45,6 +74,15 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_read_db() -> AsyncSession:
+    """Dependency to get a read-only session on the replica"""
+    async with read_session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
@@ -54,3 +92,5 @@ async def init_db():
 async def close_db():
     """Close database connections"""
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -64,6 +64,9 @@ from app.db.models.library import (
     BookReservation, FineRecord, LibrarySettings
 )
 
+# Import from payment gateway models
+from app.db.models.payment_gateway import PaymentIntentStatus, PendingPayment, PendingPaymentStatus
+
 __all__ = [
     # Enums
     "UserRole", "Gender", "AttendanceStatus", "FeeStatus",
@@ -104,6 +107,9 @@ __all__ = [
     "BookCatalog", "BookCopy", "LibraryMember", "BookTransaction",
     "BookReservation", "FineRecord", "LibrarySettings",
     
+    # Payment Gateway
+    "PaymentIntentStatus", "PendingPayment", "PendingPaymentStatus",
+    
     # Notifications
     "NotificationTemplate", "Notification", "NotificationLog",
     
@@ -11,7 +11,8 @@ from typing import Optional
 
 from sqlalchemy import (
     Column, String, Integer, Decimal, DateTime, Text, 
-    ForeignKey, Enum, Boolean, Date, UniqueConstraint
+    ForeignKey, Enum, Boolean, Date, UniqueConstraint, CheckConstraint, Index, DDL,
+    Sequence, event, text
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -205,6 +206,40 @@ class InventoryItem(Base):
     and other materials that are tracked by quantity.
     """
     __tablename__ = "inventory_items"
+    __table_args__ = (
+        CheckConstraint("quantity_on_hand >= 0", name="ck_inv_nonneg_qty"),
+        # Trigram indexes backing the ILIKE '%term%' search in list_items
+        Index(
+            "idx_inv_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ),
+        Index(
+            "idx_inv_sku_trgm", "sku",
+            postgresql_using="gin", postgresql_ops={"sku": "gin_trgm_ops"}
+        ),
+        Index(
+            "idx_inv_desc_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}
+        ),
+        # Locale-independent btree for SKU prefix lookups (LIKE 'ABC%')
+        Index(
+            "idx_inv_sku_pattern", "sku",
+            postgresql_ops={"sku": "text_pattern_ops"}
+        ),
+        # Partial indexes for the low-stock and out-of-stock predicates
+        Index(
+            "idx_inv_lowstock", "quantity_on_hand", "reorder_level",
+            postgresql_where=text("is_active = TRUE AND quantity_on_hand <= reorder_level")
+        ),
+        Index(
+            "idx_inv_active_oos", "id",
+            postgresql_where=text("is_active = TRUE AND quantity_on_hand = 0")
+        ),
+        Index(
+            "idx_inv_cat_active", "category_id",
+            postgresql_where=text("is_active = TRUE")
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(200), nullable=False)
@@ -259,6 +294,14 @@ class InventoryItem(Base):
         return f"<InventoryItem(id={self.id}, sku='{self.sku}', name='{self.name}')>"
 
 
+# The trigram indexes above need pg_trgm available before the table is created
+event.listen(
+    InventoryItem.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
 class StockTransaction(Base):
     """
     Stock transaction audit trail
@@ -295,6 +338,27 @@ class StockTransaction(Base):
         return f"<StockTransaction(id={self.id}, type={self.transaction_type}, qty={self.quantity_change})>"
 
 
+# Keyset pagination of an item's history (timestamp, id) newest first
+Index(
+    "idx_stock_tx_item_ts",
+    StockTransaction.item_id,
+    StockTransaction.timestamp.desc(),
+    StockTransaction.id.desc()
+)
+
+# History filtered by transaction type, newest first
+Index(
+    "idx_stock_tx_item_type_ts",
+    StockTransaction.item_id,
+    StockTransaction.transaction_type,
+    StockTransaction.timestamp.desc()
+)
+
+
+# Source of the running number in purchase order numbers (PO-YYYYMMDD-XXXX)
+po_number_seq = Sequence("po_number_seq", metadata=Base.metadata)
+
+
 class PurchaseOrder(Base):
     """
     Purchase order for inventory replenishment
@@ -11,7 +11,7 @@ from typing import Optional
 
 from sqlalchemy import (
     Column, String, Integer, Decimal, DateTime, Text, 
-    ForeignKey, Enum, Boolean, Date, UniqueConstraint
+    ForeignKey, Enum, Boolean, Date, UniqueConstraint, Index, DDL, Sequence, event, text
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -77,6 +77,23 @@ class BookCatalog(Base):
     Stores information about books in the library collection.
     """
     __tablename__ = "book_catalog"
+    __table_args__ = (
+        # Available-only catalog listings, ordered by title
+        Index(
+            "ix_book_available", "title",
+            postgresql_where=text("is_active = TRUE AND available_copies > 0")
+        ),
+        # Substring search (ILIKE '%term%') over title, author and ISBN
+        Index(
+            "ix_book_search_trgm", "title", "author", "isbn",
+            postgresql_using="gin",
+            postgresql_ops={
+                "title": "gin_trgm_ops",
+                "author": "gin_trgm_ops",
+                "isbn": "gin_trgm_ops",
+            }
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     isbn = Column(String(20), nullable=False, unique=True, index=True)
@@ -119,6 +136,14 @@ class BookCatalog(Base):
         return f"<BookCatalog(id={self.id}, title='{self.title}', isbn='{self.isbn}')>"
 
 
+# The trigram index above needs pg_trgm available before the table is created
+event.listen(
+    BookCatalog.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
 class BookCopy(Base):
     """
     Individual book copy model
@@ -152,6 +177,10 @@ class BookCopy(Base):
         return f"<BookCopy(id={self.id}, barcode='{self.barcode}', status='{self.status}')>"
 
 
+# Source of the running number in library card numbers (LIB-YYYY-XXXXX)
+library_card_seq = Sequence("library_card_seq", metadata=Base.metadata)
+
+
 class LibraryMember(Base):
     """
     Library member model
@@ -216,6 +245,13 @@ class BookTransaction(Base):
     Records all book issue and return transactions.
     """
     __tablename__ = "book_transactions"
+    __table_args__ = (
+        # Open loans of a book (delete guard, circulation checks)
+        Index(
+            "ix_tx_book_active", "book_id",
+            postgresql_where=text("status IN ('ISSUED', 'OVERDUE')")
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     book_id = Column(UUID(as_uuid=True), ForeignKey("book_catalog.id"), nullable=False)
@@ -291,6 +327,13 @@ class BookReservation(Base):
     Tracks holds/reservations on books that are currently unavailable.
     """
     __tablename__ = "book_reservations"
+    __table_args__ = (
+        # Reservation queue of a book in arrival order
+        Index(
+            "ix_res_book_active", "book_id", "reservation_date",
+            postgresql_where=text("status = 'ACTIVE'")
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     book_id = Column(UUID(as_uuid=True), ForeignKey("book_catalog.id"), nullable=False)
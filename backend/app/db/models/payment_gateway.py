@@ -0,0 +1,71 @@
+"""
+Payment Gateway Database Models
+Local state mirrored from external payment providers
+"""
+
+from enum import Enum as PyEnum
+
+from sqlalchemy import Column, String, Integer, BigInteger, Numeric, DateTime, Text, Enum
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class PendingPaymentStatus(str, PyEnum):
+    """Progress of a queued payment"""
+    QUEUED = "QUEUED"
+    PROCESSING = "PROCESSING"
+    CREATED = "CREATED"
+    FAILED = "FAILED"
+
+
+class PaymentIntentStatus(Base):
+    """
+    Latest known state of a Stripe PaymentIntent
+
+    Written when the intent is created and on every payment_intent.* webhook,
+    so payment verification can be answered locally instead of polling Stripe.
+    """
+    __tablename__ = "payment_intent_status"
+
+    intent_id = Column(String(255), primary_key=True)
+    status = Column(String(50), nullable=False)  # Raw Stripe status, e.g. "succeeded"
+    amount = Column(BigInteger, nullable=False)  # Smallest currency unit (paise for INR)
+    currency = Column(String(3), nullable=False)
+    intent_created_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Time of the Stripe event this row reflects; older events are ignored
+    event_created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<PaymentIntentStatus(intent_id='{self.intent_id}', status='{self.status}')>"
+
+
+class PendingPayment(Base):
+    """
+    Payment queued for creation with a provider
+
+    Non-interactive flows (e.g. school-wide fee posting) insert these and
+    return immediately; background workers create the provider payment and
+    fill in transaction_id.
+    """
+    __tablename__ = "pending_payments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reference = Column(String(255), nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    currency = Column(String(3), nullable=False)
+    payment_metadata = Column(Text, nullable=True)  # JSON object passed to the provider
+    status = Column(Enum(PendingPaymentStatus), default=PendingPaymentStatus.QUEUED, nullable=False, index=True)
+
+    # Filled in by the worker
+    transaction_id = Column(String(255), nullable=True)
+    error_code = Column(String(50), nullable=True)
+    error_message = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<PendingPayment(id={self.id}, reference='{self.reference}', status='{self.status}')>"
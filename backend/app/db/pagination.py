@@ -0,0 +1,57 @@
+"""
+Pagination helpers shared by the service layer
+"""
+
+from typing import Any, List, Sequence, Tuple, Union
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Union[Select, StatementLambdaElement],
+    order_by: Sequence[Any],
+    page: int,
+    per_page: int
+) -> Tuple[List[Any], int]:
+    """
+    Fetch one page of a single-entity query together with the total count
+
+    Rows and total come back in one round-trip via a window count. Past the
+    last page there are no rows to carry it, so only then is a separate
+    COUNT issued. Plain selects and lambda_stmt queries are both accepted;
+    the latter keep their statement caching.
+
+    Returns:
+        Tuple of (entities on the page, total matching rows)
+    """
+    offset = (page - 1) * per_page
+
+    if isinstance(query, StatementLambdaElement):
+        paged = query + (
+            lambda q: q.add_columns(func.count().over().label("_total"))
+            .order_by(*order_by)
+            .offset(offset)
+            .limit(per_page)
+        )
+    else:
+        paged = (
+            query.add_columns(func.count().over().label("_total"))
+            .order_by(*order_by)
+            .offset(offset)
+            .limit(per_page)
+        )
+
+    rows = (await db.execute(paged)).all()
+    if rows:
+        return [row[0] for row in rows], rows[0]._total
+    if page == 1:
+        return [], 0
+
+    if isinstance(query, StatementLambdaElement):
+        count_query = query + (lambda q: select(func.count()).select_from(q.subquery()))
+    else:
+        count_query = select(func.count()).select_from(query.subquery())
+    return [], (await db.execute(count_query)).scalar()
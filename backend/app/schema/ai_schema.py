@@ -3,6 +3,7 @@ AI Analysis Schemas
 Pydantic models for AI-powered analysis results
 """
 
+import sys
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field, field_validator
@@ -252,6 +253,10 @@ class MessageGenerationRequest(BaseModel):
         le=500,
         description="Maximum message length (SMS limit)"
     )
+    include_alternatives: bool = Field(
+        default=False,
+        description="Also generate an alternative-tone version of the message"
+    )
 
 
 class GeneratedMessage(BaseModel):
@@ -284,6 +289,12 @@ class GeneratedMessage(BaseModel):
         default_factory=list,
         description="Alternative message versions"
     )
+    
+    @field_validator("tone", "language")
+    @classmethod
+    def intern_label(cls, value: str) -> str:
+        """Share one copy of each tone/language label across bulk messages"""
+        return sys.intern(value)
 
 
 class BulkMessageRequest(BaseModel):
@@ -297,6 +308,12 @@ class BulkMessageRequest(BaseModel):
         default=False,
         description="Combine all recipients into single message (announcements)"
     )
+    max_concurrency: int = Field(
+        default=16,
+        ge=1,
+        le=100,
+        description="Maximum number of messages generated concurrently"
+    )
 
 
 # ==================== AI Health and Status Schemas ====================
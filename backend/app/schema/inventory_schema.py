@@ -413,12 +413,12 @@ class StockTransactionResponse(BaseModel):
 
 
 class StockTransactionListResponse(BaseModel):
-    """Paginated transaction list response"""
+    """Cursor-paginated transaction list response"""
     transactions: List[StockTransactionResponse]
-    total: int
-    page: int
     per_page: int
-    total_pages: int
+    has_next: bool
+    next_cursor: Optional[datetime] = None
+    next_cursor_id: Optional[str] = None
 
 
 # ==================== Purchase Order Schemas ====================
@@ -7,6 +7,7 @@ from datetime import datetime, date
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
 from enum import Enum
+from uuid import UUID
 
 from pydantic import BaseModel, Field, field_validator, ConfigDict
 
@@ -246,23 +247,23 @@ class MemberListResponse(BaseModel):
 
 class BookIssueRequest(BaseModel):
     """Schema for issuing a book"""
-    book_id: str
-    member_id: str
-    copy_id: Optional[str] = None
+    book_id: UUID
+    member_id: UUID
+    copy_id: Optional[UUID] = None
     days: Optional[int] = Field(None, ge=1)
     notes: Optional[str] = None
 
 
 class BookReturnRequest(BaseModel):
     """Schema for returning a book"""
-    transaction_id: str
+    transaction_id: UUID
     condition_notes: Optional[str] = None
     condition: Optional[str] = Field(None, max_length=50)
 
 
 class BookRenewRequest(BaseModel):
     """Schema for renewing a book"""
-    transaction_id: str
+    transaction_id: UUID
     notes: Optional[str] = None
 
 
@@ -313,8 +314,8 @@ class TransactionListResponse(BaseModel):
 
 class ReservationCreate(BaseModel):
     """Schema for creating a reservation"""
-    book_id: str
-    member_id: str
+    book_id: UUID
+    member_id: UUID
     notes: Optional[str] = None
 
 
@@ -366,7 +367,7 @@ class FineResponse(BaseModel):
 
 class FinePaymentRequest(BaseModel):
     """Schema for paying a fine"""
-    fine_id: str
+    fine_id: UUID
     amount: Decimal = Field(..., gt=0)
     payment_method: str = Field(..., max_length=50)
     reference_number: Optional[str] = Field(None, max_length=100)
@@ -374,7 +375,7 @@ class FinePaymentRequest(BaseModel):
 
 class FineWaiveRequest(BaseModel):
     """Schema for waiving a fine"""
-    fine_id: str
+    fine_id: UUID
     reason: str = Field(..., min_length=1)
 
 
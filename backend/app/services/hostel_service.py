@@ -2,7 +2,7 @@
 Hostel Service - Business Logic
 """
 from typing import Optional, List
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, insert, update, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from datetime import datetime
@@ -122,20 +122,24 @@ class HostelService:
     
     async def create_room(self, room_data: RoomCreate) -> Room:
         """Create a new room"""
-        room = Room(**room_data.model_dump())
-        self.session.add(room)
-        await self.session.flush()
-        
         # Auto-create beds based on bed_count or capacity
         bed_count = room_data.bed_count or room_data.capacity
-        for i in range(1, bed_count + 1):
-            bed = Bed(room_id=room.id, bed_number=str(i))
-            self.session.add(bed)
-        
-        room.bed_count = bed_count
+        room_values = room_data.model_dump()
+        room_values["bed_count"] = bed_count
+        
+        # INSERT ... RETURNING hands back the populated row, so the beds can
+        # reference room.id without a separate flush or a refresh after commit
+        room = (await self.session.scalars(
+            insert(Room).returning(Room), [room_values]
+        )).one()
+        
+        if bed_count:
+            await self.session.execute(
+                insert(Bed),
+                [{"room_id": room.id, "bed_number": str(i)} for i in range(1, bed_count + 1)]
+            )
         
         await self.session.commit()
-        await self.session.refresh(room)
         return room
     
     async def get_room(self, room_id: int) -> Optional[Room]:
@@ -281,9 +285,10 @@ class HostelService:
             # Would need to check student gender here
             pass  # Student gender check would go here
         
-        allocation = HostelAllocation(**allocation_data.model_dump())
-        self.session.add(allocation)
-        await self.session.flush()
+        allocation = (await self.session.scalars(
+            insert(HostelAllocation).returning(HostelAllocation),
+            [allocation_data.model_dump()]
+        )).one()
         
         # Update room occupancy
         room.current_occupancy += 1
@@ -292,12 +297,13 @@ class HostelService:
         
         # Update bed if specified
         if allocation_data.bed_id:
-            bed = await self.get_bed(allocation_data.bed_id)
-            if bed:
-                bed.is_occupied = True
+            await self.session.execute(
+                update(Bed)
+                .where(Bed.id == allocation_data.bed_id)
+                .values(is_occupied=True)
+            )
         
         await self.session.commit()
-        await self.session.refresh(allocation)
         return allocation
     
     async def get_allocation(self, allocation_id: int) -> Optional[HostelAllocation]:
@@ -3,12 +3,20 @@ Intelligent Notification Service
 AI-powered message generation for parent/student communications
 """
 
+import asyncio
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional
+import math
+import re
+import string
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+from cachetools import TTLCache
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.ai.provider import AIProvider, get_ai_service
+from app.services.sms.encoding import count_segments
 from app.schema.ai_schema import (
     RecipientType,
     NotificationContextType,
@@ -19,6 +27,80 @@ from app.schema.ai_schema import (
 
 logger = logging.getLogger(__name__)
 
+# Bound on queued recipients and undelivered messages in bulk generation
+_BULK_QUEUE_SIZE = 64
+
+# Tone keywords in custom_instructions that override a template's tone
+# (substring matches; "urgent" wins when both appear)
+_TONE_KEYWORD_RE = re.compile(r"urgent|friendly", re.I)
+
+# Extra characters streamed past max_length so stripping whitespace can't
+# leave a message short, and the rough characters-per-token ratio used to
+# cap server-side generation
+_STREAM_MARGIN_CHARS = 32
+_CHARS_PER_TOKEN = 3.5
+
+# Line separating the primary and alternative versions in a fused completion
+_VERSION_SEPARATOR = "\n---\n"
+
+# Stands in for the student name while a template is rewritten by the AI
+_STUDENT_NAME_MARKER = "[[STUDENT_NAME]]"
+
+
+class _SafeFormatDict(dict):
+    """format_map mapping that leaves unknown placeholders untouched"""
+    
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+def _template_fields(template: str) -> frozenset:
+    """Return the placeholder names used in a str.format template"""
+    return frozenset(
+        name for _, name, _, _ in string.Formatter().parse(template) if name
+    )
+
+
+def _available_contexts(template_tones: Dict) -> tuple:
+    """Every context/recipient pair with the tone of its template, if any"""
+    return tuple(
+        {
+            "type": ctx.value,
+            "recipient": recipient.value,
+            "tone": template_tones.get((recipient, ctx), "AI-generated")
+        }
+        for ctx in NotificationContextType
+        for recipient in RecipientType
+    )
+
+
+@lru_cache(maxsize=4096)
+def _describe_context(
+    student_name: Optional[str],
+    items: Tuple[Tuple[str, Any], ...]
+) -> str:
+    """Format context data for AI prompts; memoized for repeated bulk contexts"""
+    parts = []
+    
+    if student_name:
+        parts.append(f"Student Name: {student_name}")
+    
+    for key, value in items:
+        parts.append(f"{key.replace('_', ' ').title()}: {value}")
+    
+    return "\n".join(parts)
+
+
+def _fallback_format(context_type: NotificationContextType) -> str:
+    """Fallback message format for a context, leaving {student_name} to fill"""
+    label = context_type.value.replace("_", " ").title()
+    
+    if "WARNING" in context_type.value:
+        return "Dear Parent/Guardian, regarding {student_name}: " + label + ". Please contact the school for more information."
+    if "CELEBRATION" in context_type.value:
+        return "Dear Parent/Guardian, great news regarding {student_name}: " + label + ". We wanted to share this positive update with you."
+    return "School notification regarding {student_name}: " + label + "."
+
 
 class IntelligentNotificationService:
     """
@@ -110,14 +192,56 @@ School Administration"""
         },
     }
     
+    # Tone per template key, flattened so lookups don't go through nested dicts
+    _TEMPLATE_TONES = {key: info["tone"] for key, info in TEMPLATES.items()}
+    
+    # (template, placeholder names) per template key, parsed once at import
+    _COMPILED_TEMPLATES = {
+        key: (info["template"], _template_fields(info["template"]))
+        for key, info in TEMPLATES.items()
+    }
+    
+    # Default tone per context type for AI-generated messages
+    _TONE_MAP = {
+        NotificationContextType.ATTENDANCE_WARNING: "formal",
+        NotificationContextType.ATTENDANCE_CELEBRATION: "friendly",
+        NotificationContextType.GRADE_WARNING: "formal",
+        NotificationContextType.GRADE_CELEBRATION: "friendly",
+        NotificationContextType.BEHAVIOR_CONCERN: "formal",
+        NotificationContextType.EVENT_REMINDER: "friendly",
+        NotificationContextType.FEE_REMINDER: "formal",
+        NotificationContextType.GENERAL_ANNOUNCEMENT: "neutral",
+        NotificationContextType.CUSTOM: "neutral",
+    }
+    
+    # Fallback message format per context, resolved once instead of per failure
+    _FALLBACK_FORMATS = {ctx: _fallback_format(ctx) for ctx in NotificationContextType}
+    
+    # Template set is fixed, so the context listing is built once
+    _AVAILABLE_CONTEXTS = _available_contexts(_TEMPLATE_TONES)
+    
+    SCRATCH_SYSTEM_PROMPT = """You are a school communication assistant. Generate clear, appropriate messages for parents and students.
+- For PARENTS: Be formal, respectful, and professional
+- For STUDENTS: Be encouraging, supportive, and age-appropriate
+- Always maintain a helpful, constructive tone"""
+    
+    # Process-wide provider handle; services are created per request
+    _shared_ai: Optional[AIProvider] = None
+    
+    # AI rewrites of filled templates, keyed by everything but the student name
+    _enhancement_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+    
     def __init__(self, db: AsyncSession, ai_provider: Optional[AIProvider] = None):
         self.db = db
         self.ai = ai_provider or None
     
     async def _get_ai(self) -> AIProvider:
-        """Get AI provider lazily"""
+        """Get AI provider lazily, shared across service instances"""
         if self.ai is None:
-            self.ai = await get_ai_service()
+            cls = type(self)
+            if cls._shared_ai is None:
+                cls._shared_ai = await get_ai_service()
+            self.ai = cls._shared_ai
         return self.ai
     
     async def generate_message(
@@ -143,10 +267,22 @@ School Administration"""
             # Use pure AI generation for custom contexts
             message = await self._generate_from_scratch(request)
         
-        # Ensure message doesn't exceed max length
-        message.content = message.content[:request.max_length]
-        message.character_count = len(message.content)
-        message.sms_segments = (message.character_count // 160) + 1
+        return self._finalize_message(message, request)
+    
+    def _finalize_message(
+        self,
+        message: GeneratedMessage,
+        request: MessageGenerationRequest
+    ) -> GeneratedMessage:
+        """Apply length limits and SMS segment counts to a generated message"""
+        # Ensure message doesn't exceed max length; most already fit
+        length = len(message.content)
+        if length > request.max_length:
+            message.content = message.content[:request.max_length]
+            length = request.max_length
+        
+        message.character_count = length
+        _, message.sms_segments = count_segments(message.content)
         
         return message
     
@@ -161,19 +297,90 @@ School Administration"""
             request: Bulk message configuration
             
         Returns:
-            List of GeneratedMessage objects
+            List of GeneratedMessage objects, in recipient order
         """
-        messages = []
+        messages: List[Optional[GeneratedMessage]] = [None] * len(request.recipient_ids)
         
-        for recipient_id in request.recipient_ids:
-            msg_request = request.base_request.model_copy()
-            msg_request.student_id = recipient_id
-            
-            message = await self.generate_message(msg_request)
-            messages.append(message)
+        async for index, message in self.iter_bulk_messages(request):
+            messages[index] = message
         
         return messages
     
+    async def iter_bulk_messages(
+        self,
+        request: BulkMessageRequest
+    ) -> AsyncIterator[Tuple[int, GeneratedMessage]]:
+        """
+        Generate messages for multiple recipients through a bounded worker pool
+        
+        A producer feeds recipients into a bounded queue drained by
+        max_concurrency workers, so outstanding AI calls and buffered
+        messages stay flat however many recipients there are. Contexts
+        without a template are generated once and shared by every recipient.
+        
+        Args:
+            request: Bulk message configuration
+            
+        Yields:
+            (index into request.recipient_ids, GeneratedMessage) in completion order
+        """
+        # Recipients share one base request instead of a copy each
+        base_request = request.base_request
+        if base_request.include_alternatives:
+            # Alternatives aren't surfaced for bulk sends
+            base_request = base_request.model_copy(update={"include_alternatives": False})
+        
+        recipient_count = len(request.recipient_ids)
+        template_key = (base_request.recipient_type, base_request.context_type)
+        
+        if template_key not in self.TEMPLATES:
+            # Every recipient has the same AI context, so one generation serves them all
+            message = self._finalize_message(
+                await self._generate_from_scratch(base_request), base_request
+            )
+            for index in range(recipient_count):
+                yield index, message.model_copy()
+            return
+        
+        worker_count = max(1, min(request.max_concurrency, recipient_count))
+        
+        work: asyncio.Queue = asyncio.Queue(maxsize=_BULK_QUEUE_SIZE)
+        results: asyncio.Queue = asyncio.Queue(maxsize=_BULK_QUEUE_SIZE)
+        
+        async def produce() -> None:
+            for index in range(recipient_count):
+                await work.put(index)
+            for _ in range(worker_count):
+                await work.put(None)
+        
+        async def consume() -> None:
+            try:
+                while (index := await work.get()) is not None:
+                    message = await self.generate_message(base_request)
+                    await results.put((index, message))
+            except Exception as e:
+                await results.put(e)
+            else:
+                await results.put(None)
+        
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(consume()) for _ in range(worker_count)]
+        
+        try:
+            finished = 0
+            while finished < worker_count:
+                item = await results.get()
+                if item is None:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            # Stops the pool if the caller bails out early or a worker failed
+            for task in tasks:
+                task.cancel()
+    
     async def _generate_from_template(
         self,
         request: MessageGenerationRequest
@@ -185,22 +392,78 @@ School Administration"""
         the message based on the context data.
         """
         template_key = (request.recipient_type, request.context_type)
-        template_info = self.TEMPLATES[template_key]
-        template = template_info["template"]
-        base_tone = template_info["tone"]
+        base_tone = self._TEMPLATE_TONES[template_key]
+        template, fields = self._COMPILED_TEMPLATES[template_key]
         
-        # Fill in placeholders from key_data
-        placeholders_used = []
-        content = template
+        values = {key: str(value) for key, value in request.key_data.items()}
+        placeholders_used = [key for key in request.key_data if key in fields]
         
-        for key, value in request.key_data.items():
-            placeholder = "{" + key + "}"
-            if placeholder in content:
-                content = content.replace(placeholder, str(value))
-                placeholders_used.append(key)
+        # Routine sends skip the AI and keep the template's own tone
+        if not request.custom_instructions:
+            # Fill in placeholders from key_data in a single format pass
+            content = template.format_map(_SafeFormatDict(values))
+            return GeneratedMessage(
+                content=content,
+                tone=base_tone,
+                language=request.language,
+                placeholders_used=placeholders_used,
+                character_count=len(content),
+                sms_segments=1,
+                confidence_score=0.85,
+                alternatives=[]
+            )
         
-        # Use AI to enhance the message if custom instructions provided
-        if request.custom_instructions:
+        # Use AI to enhance the message per the custom instructions
+        content = await self._enhance_template(request, template, base_tone, values)
+        
+        # Determine final tone
+        keywords = {m.lower() for m in _TONE_KEYWORD_RE.findall(request.custom_instructions)}
+        if "urgent" in keywords:
+            tone = "urgent"
+        elif "friendly" in keywords:
+            tone = "friendly"
+        else:
+            tone = base_tone
+        
+        return GeneratedMessage(
+            content=content,
+            tone=tone,
+            language=request.language,
+            placeholders_used=placeholders_used,
+            character_count=len(content),
+            sms_segments=1,
+            confidence_score=0.85,
+            alternatives=[]
+        )
+    
+    async def _enhance_template(
+        self,
+        request: MessageGenerationRequest,
+        template: str,
+        base_tone: str,
+        values: Dict[str, str]
+    ) -> str:
+        """
+        Fill a template and rewrite it with AI, reusing cached rewrites
+        
+        The student name is replaced by a marker before the AI call, so one
+        rewrite serves every recipient that shares the rest of the context.
+        """
+        student_name = values.get("student_name")
+        shared_values = dict(values)
+        if student_name is not None:
+            shared_values["student_name"] = _STUDENT_NAME_MARKER
+        
+        cache_key = hashlib.blake2b(
+            f"{request.recipient_type}|{request.context_type}|"
+            f"{sorted(shared_values.items())}|{request.custom_instructions}|"
+            f"{request.max_length}".encode(),
+            digest_size=16
+        ).hexdigest()
+        
+        enhanced = self._enhancement_cache.get(cache_key)
+        if enhanced is None:
+            content = template.format_map(_SafeFormatDict(shared_values))
             ai = await self._get_ai()
             
             enhancement_prompt = f"""Enhance the following message while keeping the same meaning:
@@ -212,36 +475,29 @@ INSTRUCTIONS:
 - Tone: {base_tone}
 - Custom request: {request.custom_instructions}
 - Maximum length: {request.max_length} characters
+- Keep the marker {_STUDENT_NAME_MARKER} exactly as written; it stands for the student's name
 
 Please rewrite this message to better match the requested tone while preserving all key information. Output only the enhanced message."""
             
-            response = await ai.generate_text(
+            enhanced = await self._generate_capped_text(
+                ai,
                 prompt=enhancement_prompt,
                 system_prompt="You are a professional school communication assistant. Rewrite messages to be clear, appropriate, and effective.",
-                temperature=0.5
+                temperature=0.5,
+                max_length=request.max_length
             )
             
-            if response.success and response.content:
-                content = response.content.strip()
-        
-        # Determine final tone
-        tone = base_tone
-        if request.custom_instructions:
-            if "urgent" in request.custom_instructions.lower():
-                tone = "urgent"
-            elif "friendly" in request.custom_instructions.lower():
-                tone = "friendly"
+            # A rewrite that lost the name marker can't be personalised or shared
+            if not enhanced or (
+                _STUDENT_NAME_MARKER in content and _STUDENT_NAME_MARKER not in enhanced
+            ):
+                return template.format_map(_SafeFormatDict(values))
+            
+            self._enhancement_cache[cache_key] = enhanced
         
-        return GeneratedMessage(
-            content=content.strip(),
-            tone=tone,
-            language=request.language,
-            placeholders_used=placeholders_used,
-            character_count=len(content),
-            sms_segments=1,
-            confidence_score=0.85,
-            alternatives=[]
-        )
+        if student_name is not None:
+            enhanced = enhanced.replace(_STUDENT_NAME_MARKER, student_name)
+        return enhanced
     
     async def _generate_from_scratch(
         self,
@@ -261,6 +517,21 @@ Please rewrite this message to better match the requested tone while preserving
         # Determine tone based on context type
         tone = self._get_tone_for_context(request.context_type)
         
+        # Alternatives are requested in the same completion as the primary
+        # message, separated by a marker line, to avoid a second AI call
+        wants_alternative = (
+            request.include_alternatives
+            and request.context_type != NotificationContextType.GENERAL_ANNOUNCEMENT
+        )
+        
+        if wants_alternative:
+            alt_tone = 'more formal' if tone == 'friendly' else 'more friendly'
+            output_instructions = f"""Produce two versions of the message separated by a line containing only ---.
+Version 1 tone: {tone}. Version 2 tone: {alt_tone}.
+Generate only the two message versions, no explanations."""
+        else:
+            output_instructions = "Generate only the message content, no explanations."
+        
         prompt = f"""Generate a {tone} notification message for a {request.recipient_type.lower()}.
 
 CONTEXT TYPE: {request.context_type}
@@ -276,45 +547,29 @@ REQUIREMENTS:
 5. Include appropriate greeting and closing
 
 OUTPUT:
-Generate only the message content, no explanations."""
+{output_instructions}"""
         
         if request.custom_instructions:
             prompt += f"\n\nADDITIONAL INSTRUCTIONS: {request.custom_instructions}"
         
-        response = await ai.generate_text(
+        content = await self._generate_capped_text(
+            ai,
             prompt=prompt,
-            system_prompt=f"""You are a school communication assistant. Generate clear, appropriate messages for parents and students.
-- For PARENTS: Be formal, respectful, and professional
-- For STUDENTS: Be encouraging, supportive, and age-appropriate
-- Always maintain a helpful, constructive tone""",
+            system_prompt=self.SCRATCH_SYSTEM_PROMPT,
             temperature=0.7,
-            max_tokens=256
+            max_length=request.max_length * (2 if wants_alternative else 1)
         )
         
-        if not response.success:
+        if content is None:
             # Fallback to basic message
             return self._create_fallback_message(request, tone)
         
-        content = response.content.strip()
-        
-        # Generate alternatives
         alternatives = []
-        if request.context_type not in [NotificationContextType.GENERAL_ANNOUNCEMENT]:
-            alt_prompt = f"""Generate an alternative version of this message with a different tone.
-
-ORIGINAL: {content}
-ORIGINAL TONE: {tone}
-NEW TONE: {'more formal' if tone == 'friendly' else 'more friendly'}
-
-Generate only the alternative message."""
-            
-            alt_response = await ai.generate_text(
-                prompt=alt_prompt,
-                temperature=0.8
-            )
-            
-            if alt_response.success and alt_response.content:
-                alternatives.append(alt_response.content.strip())
+        if wants_alternative:
+            primary, separator, alternative = content.partition(_VERSION_SEPARATOR)
+            content = primary.strip()
+            if separator and alternative.strip():
+                alternatives.append(alternative.strip())
         
         return GeneratedMessage(
             content=content,
@@ -327,32 +582,59 @@ Generate only the alternative message."""
             alternatives=alternatives
         )
     
-    def _build_context_description(self, request: MessageGenerationRequest) -> str:
-        """Build a human-readable context description from key data"""
-        parts = []
+    async def _generate_capped_text(
+        self,
+        ai: AIProvider,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_length: int
+    ) -> Optional[str]:
+        """
+        Stream a completion and stop once it can fill max_length
         
-        if request.student_name:
-            parts.append(f"Student Name: {request.student_name}")
+        Returns the stripped text, or None if the provider fails.
+        """
+        budget = max_length + _STREAM_MARGIN_CHARS
+        chunks = []
+        total = 0
         
-        for key, value in request.key_data.items():
-            parts.append(f"{key.replace('_', ' ').title()}: {value}")
+        stream = ai.generate_text_stream(
+            prompt=prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=math.ceil(budget / _CHARS_PER_TOKEN)
+        )
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                total += len(chunk)
+                if total >= budget:
+                    break
+        except Exception as e:
+            logger.warning(f"AI text stream failed: {e}")
+            return None
+        finally:
+            await stream.aclose()
         
-        return "\n".join(parts)
+        return "".join(chunks).strip()
+    
+    def _build_context_description(
+        self,
+        request: MessageGenerationRequest
+    ) -> str:
+        """Build a human-readable context description from key data"""
+        # Sorted so the same key data hits the memo whatever its insertion order
+        items = tuple(sorted(request.key_data.items()))
+        try:
+            return _describe_context(request.student_name, items)
+        except TypeError:
+            # Unhashable key_data values (lists, dicts) can't be memoized
+            return _describe_context.__wrapped__(request.student_name, items)
     
     def _get_tone_for_context(self, context_type: NotificationContextType) -> str:
         """Determine appropriate tone for the context type"""
-        tone_map = {
-            NotificationContextType.ATTENDANCE_WARNING: "formal",
-            NotificationContextType.ATTENDANCE_CELEBRATION: "friendly",
-            NotificationContextType.GRADE_WARNING: "formal",
-            NotificationContextType.GRADE_CELEBRATION: "friendly",
-            NotificationContextType.BEHAVIOR_CONCERN: "formal",
-            NotificationContextType.EVENT_REMINDER: "friendly",
-            NotificationContextType.FEE_REMINDER: "formal",
-            NotificationContextType.GENERAL_ANNOUNCEMENT: "neutral",
-            NotificationContextType.CUSTOM: "neutral",
-        }
-        return tone_map.get(context_type, "neutral")
+        return self._TONE_MAP.get(context_type, "neutral")
     
     def _create_fallback_message(
         self,
@@ -360,15 +642,9 @@ Generate only the alternative message."""
         tone: str
     ) -> GeneratedMessage:
         """Create a basic message when AI is unavailable"""
-        student_name = request.student_name or "the student"
-        context_type = request.context_type.value.replace("_", " ").title()
-        
-        if "WARNING" in request.context_type.value:
-            content = f"Dear Parent/Guardian, regarding {student_name}: {context_type}. Please contact the school for more information."
-        elif "CELEBRATION" in request.context_type.value:
-            content = f"Dear Parent/Guardian, great news regarding {student_name}: {context_type}. We wanted to share this positive update with you."
-        else:
-            content = f"School notification regarding {student_name}: {context_type}."
+        content = self._FALLBACK_FORMATS[request.context_type].format(
+            student_name=request.student_name or "the student"
+        )
         
         return GeneratedMessage(
             content=content,
@@ -383,12 +659,4 @@ Generate only the alternative message."""
     
     def get_available_contexts(self) -> List[Dict[str, str]]:
         """Get list of available notification context types"""
-        return [
-            {
-                "type": ctx.value,
-                "recipient": recipient.value,
-                "tone": self.TEMPLATES.get((recipient, ctx), {}).get("tone", "AI-generated")
-            }
-            for ctx in NotificationContextType
-            for recipient in RecipientType
-        ]
+        return list(self._AVAILABLE_CONTEXTS)
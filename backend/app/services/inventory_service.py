@@ -3,28 +3,37 @@ Inventory Service
 Business logic for inventory management and stock control
 """
 
+import json
 import logging
 import uuid
 from datetime import datetime
 from decimal import Decimal
 from typing import List, Optional, Tuple
 
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, insert, update, case, func, and_, or_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager, raiseload, selectinload
 
+from app.core.cache import cache_delete, cache_get, cache_set
 from app.db.models import (
     InventoryItem, StockTransaction, Supplier, ItemCategory, 
     TransactionType, PurchaseOrder, PurchaseOrderDetail
 )
+from app.db.models.inventory import po_number_seq
+from app.db.pagination import fetch_page
 from app.schema.inventory_schema import (
     InventoryCreate, InventoryUpdate, StockAdjustment,
     StockAdjustmentResult, LowStockAlert, InventoryStatsResponse,
-    PurchaseOrderCreate, PurchaseOrderDetailBase
+    PurchaseOrderCreate, PurchaseOrderDetailBase, PurchaseOrderStatus
 )
 
 logger = logging.getLogger(__name__)
 
+# Dashboard aggregates are cached briefly and dropped whenever stock changes
+STATS_CACHE_KEY = "inv:stats:v1"
+LOW_STOCK_CACHE_KEY = "inv:low_stock:v1"
+CACHE_TTL_SECONDS = 60
+
 
 class InventoryService:
     """
@@ -35,11 +44,12 @@ class InventoryService:
     """
     
     def __init__(self, db: AsyncSession):
+        # Read-only endpoints pass a replica session (get_read_db)
         self.db = db
     
     # ==================== CRUD Operations ====================
     
-    async def get_by_id(self, item_id: str) -> Optional[InventoryItem]:
+    async def get_by_id(self, item_id: uuid.UUID) -> Optional[InventoryItem]:
         """Get inventory item by ID"""
         result = await self.db.execute(
             select(InventoryItem)
@@ -47,7 +57,7 @@ class InventoryService:
                 selectinload(InventoryItem.category),
                 selectinload(InventoryItem.supplier)
             )
-            .where(InventoryItem.id == uuid.UUID(item_id))
+            .where(InventoryItem.id == item_id)
         )
         return result.scalar_one_or_none()
     
@@ -73,10 +83,17 @@ class InventoryService:
         
         Returns tuple of (items, total_count)
         """
-        query = select(InventoryItem).options(
-            selectinload(InventoryItem.category),
-            selectinload(InventoryItem.supplier)
-        ).where(InventoryItem.is_active == True)
+        query = (
+            select(InventoryItem)
+            .outerjoin(InventoryItem.category)
+            .outerjoin(InventoryItem.supplier)
+            .options(
+                contains_eager(InventoryItem.category),
+                contains_eager(InventoryItem.supplier),
+                raiseload("*")
+            )
+            .where(InventoryItem.is_active == True)
+        )
         
         # Apply filters
         if category_id:
@@ -88,7 +105,11 @@ class InventoryService:
         if low_stock_only:
             query = query.where(InventoryItem.quantity_on_hand <= InventoryItem.reorder_level)
         
-        if search:
+        if search and search.endswith("*"):
+            # SKU prefix search ("ABC-12*") served by the text_pattern_ops index
+            prefix = search[:-1].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.where(InventoryItem.sku.like(f"{prefix}%", escape="\\"))
+        elif search:
             search_term = f"%{search}%"
             query = query.where(
                 or_(
@@ -98,19 +119,7 @@ class InventoryService:
                 )
             )
         
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        count_result = await self.db.execute(count_query)
-        total = count_result.scalar() or 0
-        
-        # Apply pagination
-        query = query.order_by(InventoryItem.name)
-        query = query.offset((page - 1) * per_page).limit(per_page)
-        
-        result = await self.db.execute(query)
-        items = result.scalars().all()
-        
-        return list(items), total
+        return await fetch_page(self.db, query, (InventoryItem.name,), page, per_page)
     
     async def create(self, data: InventoryCreate) -> InventoryItem:
         """Create new inventory item"""
@@ -137,30 +146,38 @@ class InventoryService:
         )
         
         self.db.add(item)
-        await self.db.commit()
-        await self.db.refresh(item)
         
-        # Log initial stock if quantity > 0
-        if item.quantity_on_hand > 0:
+        # Log initial stock in the same flush so both rows commit together
+        if data.quantity_on_hand > 0:
             await self._create_transaction(
-                item_id=str(item.id),
+                item_id=item.id,
                 transaction_type=TransactionType.ADJUSTMENT,
-                quantity=item.quantity_on_hand,
+                quantity=data.quantity_on_hand,
                 quantity_before=0,
-                quantity_after=item.quantity_on_hand,
+                quantity_after=data.quantity_on_hand,
                 notes="Initial stock on creation",
                 performed_by_name="System"
             )
         
+        await self.db.commit()
+        await self.db.refresh(item)
+        await self._invalidate_cached_reports()
         return item
     
     async def update(
         self, 
-        item_id: str, 
+        item_id: uuid.UUID, 
         data: InventoryUpdate
     ) -> Optional[InventoryItem]:
         """Update inventory item"""
-        item = await self.get_by_id(item_id)
+        item = await self.db.get(
+            InventoryItem,
+            item_id,
+            options=[
+                selectinload(InventoryItem.category),
+                selectinload(InventoryItem.supplier)
+            ]
+        )
         if not item:
             return None
         
@@ -172,17 +189,19 @@ class InventoryService:
         
         await self.db.commit()
         await self.db.refresh(item)
+        await self._invalidate_cached_reports()
         
         return item
     
-    async def delete(self, item_id: str) -> bool:
+    async def delete(self, item_id: uuid.UUID) -> bool:
         """Soft delete inventory item"""
-        item = await self.get_by_id(item_id)
+        item = await self.db.get(InventoryItem, item_id)
         if not item:
             return False
         
         item.is_active = False
         await self.db.commit()
+        await self._invalidate_cached_reports()
         
         return True
     
@@ -190,7 +209,7 @@ class InventoryService:
     
     async def adjust_stock(
         self,
-        item_id: str,
+        item_id: uuid.UUID,
         adjustment: StockAdjustment,
         performed_by_id: Optional[str] = None,
         performed_by_name: Optional[str] = None
@@ -201,56 +220,103 @@ class InventoryService:
         Creates a transaction record and updates the quantity atomically.
         Prevents negative stock levels.
         """
-        item = await self.get_by_id(item_id)
-        if not item:
-            raise ValueError(f"Inventory item '{item_id}' not found")
+        item_name, quantity_before, quantity_after, transaction = (
+            await self._adjust_stock_core(
+                item_id=item_id,
+                transaction_type=adjustment.transaction_type,
+                quantity_change=adjustment.quantity,
+                notes=adjustment.notes,
+                reference_type=adjustment.reference_type,
+                reference_id=adjustment.reference_id,
+                performed_by_id=performed_by_id,
+                performed_by_name=performed_by_name
+            )
+        )
         
-        quantity_before = item.quantity_on_hand
-        quantity_change = adjustment.quantity
-        quantity_after = quantity_before + quantity_change
+        await self.db.commit()
+        await self._invalidate_cached_reports()
         
-        # Prevent negative stock
-        if quantity_after < 0:
+        return StockAdjustmentResult(
+            success=True,
+            item_id=str(item_id),
+            item_name=item_name,
+            transaction_type=adjustment.transaction_type,
+            quantity_before=quantity_before,
+            quantity_after=quantity_after,
+            transaction_id=str(transaction.id),
+            timestamp=transaction.timestamp
+        )
+    
+    async def _adjust_stock_core(
+        self,
+        item_id: uuid.UUID,
+        transaction_type: TransactionType,
+        quantity_change: int,
+        notes: Optional[str] = None,
+        reference_type: Optional[str] = None,
+        reference_id: Optional[str] = None,
+        performed_by_id: Optional[str] = None,
+        performed_by_name: Optional[str] = None
+    ) -> Tuple[str, int, int, StockTransaction]:
+        """
+        Apply a stock change and record its transaction without committing
+        
+        Internal callers that process many changes use this directly and
+        commit once, skipping the StockAdjustmentResult model.
+        
+        Returns tuple of (item_name, quantity_before, quantity_after, transaction)
+        """
+        # Apply the change atomically; the guard prevents negative stock
+        # (ck_inv_nonneg_qty backs it up for other writers)
+        result = await self.db.execute(
+            update(InventoryItem)
+            .where(and_(
+                InventoryItem.id == item_id,
+                InventoryItem.quantity_on_hand + quantity_change >= 0
+            ))
+            .values(
+                quantity_on_hand=InventoryItem.quantity_on_hand + quantity_change,
+                updated_at=func.now()
+            )
+            .returning(InventoryItem.name, InventoryItem.quantity_on_hand)
+        )
+        row = result.one_or_none()
+        
+        if row is None:
+            current = await self.db.execute(
+                select(InventoryItem.quantity_on_hand)
+                .where(InventoryItem.id == item_id)
+            )
+            quantity_before = current.scalar_one_or_none()
+            if quantity_before is None:
+                raise ValueError(f"Inventory item '{item_id}' not found")
             raise ValueError(
                 f"Cannot reduce stock by {abs(quantity_change)}. "
                 f"Current stock: {quantity_before}, Requested: {quantity_change}"
             )
         
-        # Update stock level
-        item.quantity_on_hand = quantity_after
-        item.updated_at = datetime.utcnow()
+        item_name, quantity_after = row
+        quantity_before = quantity_after - quantity_change
         
         # Create transaction record
         transaction = await self._create_transaction(
             item_id=item_id,
-            transaction_type=adjustment.transaction_type,
+            transaction_type=transaction_type,
             quantity=abs(quantity_change),
             quantity_before=quantity_before,
             quantity_after=quantity_after,
-            notes=adjustment.notes,
-            reference_type=adjustment.reference_type,
-            reference_id=adjustment.reference_id,
+            notes=notes,
+            reference_type=reference_type,
+            reference_id=reference_id,
             performed_by_id=performed_by_id,
             performed_by_name=performed_by_name
         )
         
-        await self.db.commit()
-        await self.db.refresh(item)
-        
-        return StockAdjustmentResult(
-            success=True,
-            item_id=item_id,
-            item_name=item.name,
-            transaction_type=adjustment.transaction_type,
-            quantity_before=quantity_before,
-            quantity_after=quantity_after,
-            transaction_id=str(transaction.id),
-            timestamp=transaction.timestamp
-        )
+        return item_name, quantity_before, quantity_after, transaction
     
     async def consume_stock(
         self,
-        item_id: str,
+        item_id: uuid.UUID,
         quantity: int,
         notes: Optional[str] = None,
         performed_by_id: Optional[str] = None,
@@ -270,7 +336,7 @@ class InventoryService:
     
     async def receive_stock(
         self,
-        item_id: str,
+        item_id: uuid.UUID,
         quantity: int,
         notes: Optional[str] = None,
         reference_type: Optional[str] = None,
@@ -296,16 +362,24 @@ class InventoryService:
     
     async def get_transactions(
         self,
-        item_id: str,
-        page: int = 1,
+        item_id: uuid.UUID,
         per_page: int = 50,
+        cursor: Optional[datetime] = None,
+        cursor_id: Optional[uuid.UUID] = None,
         transaction_type: Optional[TransactionType] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
-    ) -> Tuple[List[StockTransaction], int]:
-        """Get transaction history for an item"""
+    ) -> Tuple[List[StockTransaction], bool]:
+        """
+        Get transaction history for an item, newest first
+        
+        Uses keyset pagination: pass the timestamp and id of the last
+        transaction from the previous page as cursor/cursor_id.
+        
+        Returns tuple of (transactions, has_next)
+        """
         query = select(StockTransaction).where(
-            StockTransaction.item_id == uuid.UUID(item_id)
+            StockTransaction.item_id == item_id
         )
         
         if transaction_type:
@@ -317,29 +391,39 @@ class InventoryService:
         if end_date:
             query = query.where(StockTransaction.timestamp <= end_date)
         
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        count_result = await self.db.execute(count_query)
-        total = count_result.scalar() or 0
+        if cursor and cursor_id:
+            query = query.where(
+                tuple_(StockTransaction.timestamp, StockTransaction.id) < (cursor, cursor_id)
+            )
+        elif cursor:
+            query = query.where(StockTransaction.timestamp < cursor)
         
-        # Apply pagination
-        query = query.order_by(StockTransaction.timestamp.desc())
-        query = query.offset((page - 1) * per_page).limit(per_page)
+        # Fetch one extra row to learn whether another page follows
+        query = query.order_by(
+            StockTransaction.timestamp.desc(), StockTransaction.id.desc()
+        ).limit(per_page + 1)
         
         result = await self.db.execute(query)
-        transactions = result.scalars().all()
+        transactions = list(result.scalars().all())
         
-        return list(transactions), total
+        return transactions[:per_page], len(transactions) > per_page
     
     # ==================== Alerts and Reports ====================
     
     async def get_low_stock_alerts(self) -> List[LowStockAlert]:
         """Get all items below reorder level"""
+        cached = await cache_get(LOW_STOCK_CACHE_KEY)
+        if cached is not None:
+            return [LowStockAlert.model_validate(alert) for alert in json.loads(cached)]
+        
         result = await self.db.execute(
             select(InventoryItem)
+            .outerjoin(InventoryItem.category)
+            .outerjoin(InventoryItem.supplier)
             .options(
-                selectinload(InventoryItem.category),
-                selectinload(InventoryItem.supplier)
+                contains_eager(InventoryItem.category),
+                contains_eager(InventoryItem.supplier),
+                raiseload("*")
             )
             .where(and_(
                 InventoryItem.is_active == True,
@@ -364,6 +448,11 @@ class InventoryService:
                 suggested_order_qty=item.reorder_quantity
             ))
         
+        await cache_set(
+            LOW_STOCK_CACHE_KEY,
+            json.dumps([alert.model_dump(mode="json") for alert in alerts]),
+            CACHE_TTL_SECONDS
+        )
         return alerts
     
     async def get_out_of_stock_items(self) -> List[InventoryItem]:
@@ -379,62 +468,57 @@ class InventoryService:
     
     async def get_stats(self) -> InventoryStatsResponse:
         """Get inventory statistics"""
-        # Total items
-        total_query = select(func.count()).select_from(
-            select(InventoryItem.id).where(InventoryItem.is_active == True).subquery()
-        )
-        total_result = await self.db.execute(total_query)
-        total_items = total_result.scalar() or 0
-        
-        # Total value
-        value_query = select(func.sum(
-            InventoryItem.quantity_on_hand * InventoryItem.cost_per_unit
-        )).where(InventoryItem.is_active == True)
-        value_result = await self.db.execute(value_query)
-        total_value = value_result.scalar() or Decimal("0")
-        
-        # Low stock count
-        low_stock_query = select(func.count()).select_from(
-            select(InventoryItem.id).where(and_(
-                InventoryItem.is_active == True,
+        cached = await cache_get(STATS_CACHE_KEY)
+        if cached is not None:
+            return InventoryStatsResponse.model_validate_json(cached)
+        
+        # Scalar counters in one pass over inventory_items
+        is_active = InventoryItem.is_active == True
+        counters_query = select(
+            func.count().filter(is_active),
+            func.coalesce(
+                func.sum(
+                    InventoryItem.quantity_on_hand * InventoryItem.cost_per_unit
+                ).filter(is_active),
+                0
+            ),
+            func.count().filter(and_(
+                is_active,
                 InventoryItem.quantity_on_hand <= InventoryItem.reorder_level
-            )).subquery()
-        )
-        low_stock_result = await self.db.execute(low_stock_query)
-        low_stock_count = low_stock_result.scalar() or 0
-        
-        # Out of stock count
-        out_of_stock_query = select(func.count()).select_from(
-            select(InventoryItem.id).where(and_(
-                InventoryItem.is_active == True,
+            )),
+            func.count().filter(and_(
+                is_active,
                 InventoryItem.quantity_on_hand == 0
-            )).subquery()
+            ))
+        ).select_from(InventoryItem)
+        counters_result = await self.db.execute(counters_query)
+        total_items, total_value, low_stock_count, out_of_stock_count = (
+            counters_result.one()
         )
-        out_of_stock_result = await self.db.execute(out_of_stock_query)
-        out_of_stock_count = out_of_stock_result.scalar() or 0
         
         # Category breakdown
         category_query = select(
             ItemCategory.name,
-            func.count(InventoryItem.id)
-        ).join(
-            InventoryItem, 
+            func.count(InventoryItem.id).filter(is_active)
+        ).select_from(ItemCategory).outerjoin(
+            InventoryItem,
             InventoryItem.category_id == ItemCategory.id
-        ).where(and_(
-            InventoryItem.is_active == True,
+        ).where(
             ItemCategory.is_active == True
-        )).group_by(ItemCategory.name)
+        ).group_by(ItemCategory.name)
         
         category_result = await self.db.execute(category_query)
         category_breakdown = dict(category_result.all())
         
-        return InventoryStatsResponse(
+        stats = InventoryStatsResponse(
             total_items=total_items,
             total_value=total_value,
             low_stock_count=low_stock_count,
             out_of_stock_count=out_of_stock_count,
             category_breakdown=category_breakdown
         )
+        await cache_set(STATS_CACHE_KEY, stats.model_dump_json(), CACHE_TTL_SECONDS)
+        return stats
     
     # ==================== Purchase Orders ====================
     
@@ -448,61 +532,66 @@ class InventoryService:
         order_number = await self._generate_order_number()
         
         # Calculate totals
-        subtotal = Decimal("0")
-        details = []
-        
-        for detail_data in data.details:
-            total = detail_data.unit_price * detail_data.quantity_ordered
-            subtotal += total
-            
-            detail = PurchaseOrderDetail(
-                id=uuid.uuid4(),
-                item_id=uuid.UUID(detail_data.item_id),
-                quantity_ordered=detail_data.quantity_ordered,
-                quantity_received=0,
-                unit_price=detail_data.unit_price,
-                total_price=total,
-                notes=detail_data.notes
-            )
-            details.append(detail)
+        line_totals = [d.unit_price * d.quantity_ordered for d in data.details]
+        subtotal = sum(line_totals, Decimal("0"))
+        details = [
+            {
+                "id": uuid.uuid4(),
+                "item_id": uuid.UUID(detail_data.item_id),
+                "quantity_ordered": detail_data.quantity_ordered,
+                "quantity_received": 0,
+                "unit_price": detail_data.unit_price,
+                "total_price": total,
+                "notes": detail_data.notes
+            }
+            for detail_data, total in zip(data.details, line_totals)
+        ]
         
         tax_amount = subtotal * Decimal("0.10")  # 10% tax example
         total_amount = subtotal + tax_amount
         
-        order = PurchaseOrder(
-            id=uuid.uuid4(),
-            order_number=order_number,
-            supplier_id=uuid.UUID(data.supplier_id),
-            order_date=data.order_date,
-            expected_delivery=data.expected_delivery,
-            notes=data.notes,
-            created_by_id=uuid.UUID(created_by_id) if created_by_id else None,
-            subtotal=subtotal,
-            tax_amount=tax_amount,
-            total_amount=total_amount,
-            details=details
+        result = await self.db.execute(
+            insert(PurchaseOrder).returning(PurchaseOrder),
+            [{
+                "id": uuid.uuid4(),
+                "order_number": order_number,
+                "supplier_id": uuid.UUID(data.supplier_id),
+                "order_date": data.order_date,
+                "expected_delivery": data.expected_delivery,
+                "notes": data.notes,
+                "created_by_id": uuid.UUID(created_by_id) if created_by_id else None,
+                "subtotal": subtotal,
+                "tax_amount": tax_amount,
+                "total_amount": total_amount
+            }]
         )
+        order = result.scalar_one()
+        
+        # Insert all lines in one executemany batch
+        if details:
+            for detail in details:
+                detail["order_id"] = order.id
+            await self.db.execute(insert(PurchaseOrderDetail), details)
         
-        self.db.add(order)
         await self.db.commit()
-        await self.db.refresh(order)
         
         return order
     
     async def receive_purchase_order(
         self,
-        order_id: str,
+        order_id: uuid.UUID,
         received_by_id: Optional[str] = None,
         received_by_name: Optional[str] = None
     ) -> PurchaseOrder:
         """Receive a purchase order and update inventory"""
         result = await self.db.execute(
             select(PurchaseOrder)
+            .outerjoin(PurchaseOrder.supplier)
             .options(
-                selectinload(PurchaseOrder.details).selectinload(PurchaseOrderDetail.item),
-                selectinload(PurchaseOrder.supplier)
+                selectinload(PurchaseOrder.details),
+                contains_eager(PurchaseOrder.supplier)
             )
-            .where(PurchaseOrder.id == uuid.UUID(order_id))
+            .where(PurchaseOrder.id == order_id)
         )
         order = result.scalar_one_or_none()
         
@@ -512,36 +601,73 @@ class InventoryService:
         if order.status not in [PurchaseOrderStatus.ORDERED, PurchaseOrderStatus.PENDING]:
             raise ValueError(f"Purchase order cannot be received. Current status: {order.status}")
         
-        # Process each item
+        # Outstanding quantity per line, and per item for the stock update
+        pending = []
+        increments = {}
         for detail in order.details:
             if detail.quantity_received < detail.quantity_ordered:
                 remaining = detail.quantity_ordered - detail.quantity_received
-                
-                # Update inventory
-                await self.receive_stock(
-                    item_id=str(detail.item_id),
-                    quantity=remaining,
-                    reference_type="PURCHASE_ORDER",
-                    reference_id=str(order.id),
-                    performed_by_id=received_by_id,
-                    performed_by_name=received_by_name
+                pending.append((detail, remaining))
+                increments[detail.item_id] = increments.get(detail.item_id, 0) + remaining
+        
+        if increments:
+            # One UPDATE for every received item
+            result = await self.db.execute(
+                update(InventoryItem)
+                .where(InventoryItem.id.in_(increments))
+                .values(
+                    quantity_on_hand=InventoryItem.quantity_on_hand + case(
+                        increments, value=InventoryItem.id, else_=0
+                    ),
+                    updated_at=func.now()
                 )
-                
+                .returning(InventoryItem.id, InventoryItem.quantity_on_hand)
+            )
+            running = {
+                item_id: quantity_after - increments[item_id]
+                for item_id, quantity_after in result.all()
+            }
+            
+            # One multi-row INSERT for the matching transaction records
+            performed_by_id = uuid.UUID(received_by_id) if received_by_id else None
+            transactions = []
+            for detail, remaining in pending:
+                quantity_before = running[detail.item_id]
+                running[detail.item_id] = quantity_before + remaining
+                transactions.append({
+                    "id": uuid.uuid4(),
+                    "item_id": detail.item_id,
+                    "transaction_type": TransactionType.PURCHASE,
+                    "quantity_change": remaining,
+                    "quantity_before": quantity_before,
+                    "quantity_after": quantity_before + remaining,
+                    "reference_type": "PURCHASE_ORDER",
+                    "reference_id": str(order.id),
+                    "performed_by_id": performed_by_id,
+                    "performed_by_name": received_by_name
+                })
                 detail.quantity_received = detail.quantity_ordered
+            
+            await self.db.execute(insert(StockTransaction), transactions)
         
         order.status = PurchaseOrderStatus.RECEIVED
         order.actual_delivery = datetime.utcnow().date()
         
         await self.db.commit()
         await self.db.refresh(order)
+        await self._invalidate_cached_reports()
         
         return order
     
     # ==================== Helper Methods ====================
     
+    async def _invalidate_cached_reports(self) -> None:
+        """Drop cached stats and low stock alerts after a stock change"""
+        await cache_delete(STATS_CACHE_KEY, LOW_STOCK_CACHE_KEY)
+    
     async def _create_transaction(
         self,
-        item_id: str,
+        item_id: uuid.UUID,
         transaction_type: TransactionType,
         quantity: int,
         quantity_before: int,
@@ -555,7 +681,7 @@ class InventoryService:
         """Create a stock transaction record"""
         transaction = StockTransaction(
             id=uuid.uuid4(),
-            item_id=uuid.UUID(item_id),
+            item_id=item_id,
             transaction_type=transaction_type,
             quantity_change=quantity,
             quantity_before=quantity_before,
@@ -575,11 +701,8 @@ class InventoryService:
         # Format: PO-YYYYMMDD-XXXX
         date_str = datetime.utcnow().strftime("%Y%m%d")
         
-        # Get count of orders today
-        result = await self.db.execute(
-            select(func.count()).select_from(PurchaseOrder)
-            .where(PurchaseOrder.order_number.like(f"PO-{date_str}%"))
-        )
-        count = (result.scalar() or 0) + 1
+        # Draw from a sequence so concurrent orders never share a number
+        result = await self.db.execute(select(po_number_seq.next_value()))
+        number = result.scalar_one()
         
-        return f"PO-{date_str}-{count:04d}"
+        return f"PO-{date_str}-{number:04d}"
@@ -5,28 +5,48 @@ Business logic for library management and book circulation
 
 import logging
 import uuid
-from datetime import datetime, date, timedelta
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta, timezone
 from decimal import Decimal
 from typing import List, Optional, Tuple
 
-from sqlalchemy import select, func, and_, or_
+from cachetools import TTLCache
+from sqlalchemy import select, insert, update, case, exists, func, lambda_stmt, literal, and_, or_, true
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, raiseload, selectinload
 
 from app.db.models import (
-    BookCatalog, BookCopy, LibraryMember, BookTransaction, 
+    UserProfile, BookCatalog, BookCopy, LibraryMember, BookTransaction, 
     BookReservation, FineRecord, LibrarySettings,
     BookCategory, MemberType, MemberStatus, TransactionStatus, ReservationStatus
 )
+from app.db.models.library import library_card_seq
+from app.db.pagination import fetch_page
 from app.schema.library_schema import (
     BookCreate, BookUpdate, BookIssueRequest, BookReturnRequest, BookRenewRequest,
     ReservationCreate, FinePaymentRequest, FineWaiveRequest,
-    IssueReceipt, ReturnReceipt, OverdueItem
+    IssueReceipt, ReturnReceipt
 )
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True, frozen=True)
+class OverdueItemRow:
+    """Overdue report row; same fields as OverdueItem without per-row validation"""
+    transaction_id: str
+    book_id: str
+    book_title: str
+    book_isbn: str
+    member_id: str
+    member_card: str
+    member_name: str
+    due_date: datetime
+    overdue_days: int
+    fine_amount: Decimal
+    status: str
+
+
 class LibraryService:
     """
     Service for library management and book circulation
@@ -35,13 +55,43 @@ class LibraryService:
     circulation tracking, reservations, and fine management.
     """
     
-    def __init__(self, db: AsyncSession):
+    # Process-wide settings row; services are created per request
+    _settings_cache: TTLCache = TTLCache(maxsize=1, ttl=60)
+    
+    # Loans in these states can no longer be returned
+    _CLOSED_STATUSES = (TransactionStatus.RETURNED, TransactionStatus.LOST)
+    
+    def __init__(self, db: AsyncSession, autocommit: bool = True):
+        """
+        Args:
+            db: Database session
+            autocommit: Commit after each write. Pass False to batch several
+                calls into one transaction; methods then only flush and the
+                caller commits (or rolls back) the session.
+        """
         self.db = db
+        self.autocommit = autocommit
+    
+    async def _commit(self) -> None:
+        """Commit the write, or just flush it when the caller owns the transaction"""
+        if self.autocommit:
+            await self.db.commit()
+        else:
+            await self.db.flush()
+    
+    async def _rollback(self) -> None:
+        """Roll back a failed write unless the caller owns the transaction"""
+        if self.autocommit:
+            await self.db.rollback()
     
     # ==================== Settings ====================
     
     async def get_settings(self) -> LibrarySettings:
-        """Get library settings"""
+        """Get library settings (cached for up to a minute)"""
+        settings = self._settings_cache.get(1)
+        if settings is not None:
+            return settings
+        
         result = await self.db.execute(
             select(LibrarySettings).where(LibrarySettings.id == 1)
         )
@@ -51,9 +101,15 @@ class LibraryService:
             # Create default settings
             settings = LibrarySettings(id=1)
             self.db.add(settings)
-            await self.db.commit()
+            await self._commit()
             await self.db.refresh(settings)
+            if not self.autocommit:
+                # Only flushed; the caller may still roll it back, so don't share it
+                return settings
         
+        # Detach so a later rollback in this session cannot expire the cached row
+        self.db.expunge(settings)
+        self._settings_cache[1] = settings
         return settings
     
     async def _get_member_limits(self, member_type: MemberType) -> Tuple[int, int]:
@@ -66,13 +122,11 @@ class LibraryService:
     
     # ==================== Book Catalog ====================
     
-    async def get_book_by_id(self, book_id: str) -> Optional[BookCatalog]:
+    async def get_book_by_id(self, book_id: uuid.UUID) -> Optional[BookCatalog]:
         """Get book by ID"""
-        result = await self.db.execute(
-            select(BookCatalog)
-            .options(selectinload(BookCatalog.transactions))
-            .where(BookCatalog.id == uuid.UUID(book_id))
-        )
+        result = await self.db.execute(lambda_stmt(
+            lambda: select(BookCatalog).where(BookCatalog.id == book_id)
+        ))
         return result.scalar_one_or_none()
     
     async def get_book_by_isbn(self, isbn: str) -> Optional[BookCatalog]:
@@ -95,6 +149,19 @@ class LibraryService:
         """Search books with filters"""
         query = select(BookCatalog).where(BookCatalog.is_active == True)
         
+        # Equality filters first, substring matches last
+        if isbn:
+            query = query.where(BookCatalog.isbn == isbn)
+        
+        if category:
+            query = query.where(BookCatalog.category == category)
+        
+        if available_only:
+            query = query.where(BookCatalog.available_copies > 0)
+        
+        if author:
+            query = query.where(BookCatalog.author.ilike(f"%{author}%"))
+        
         if search:
             search_term = f"%{search}%"
             query = query.where(
@@ -105,31 +172,14 @@ class LibraryService:
                 )
             )
         
-        if category:
-            query = query.where(BookCatalog.category == category)
-        
-        if author:
-            query = query.where(BookCatalog.author.ilike(f"%{author}%"))
-        
         if isbn:
-            query = query.where(BookCatalog.isbn == isbn)
+            # ISBN is unique, so there is at most one match and nothing to page or count
+            book = (await self.db.execute(query)).scalar_one_or_none()
+            if not book:
+                return [], 0
+            return ([book] if page == 1 else []), 1
         
-        if available_only:
-            query = query.where(BookCatalog.available_copies > 0)
-        
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        count_result = await self.db.execute(count_query)
-        total = count_result.scalar() or 0
-        
-        # Apply pagination
-        query = query.order_by(BookCatalog.title)
-        query = query.offset((page - 1) * per_page).limit(per_page)
-        
-        result = await self.db.execute(query)
-        books = result.scalars().all()
-        
-        return list(books), total
+        return await fetch_page(self.db, query, (BookCatalog.title,), page, per_page)
     
     async def create_book(self, data: BookCreate) -> BookCatalog:
         """Create new book"""
@@ -138,6 +188,8 @@ class LibraryService:
         if existing:
             raise ValueError(f"Book with ISBN '{data.isbn}' already exists")
         
+        # Timestamps are set here so the new row needs no refresh
+        now = datetime.now(timezone.utc)
         book = BookCatalog(
             id=uuid.uuid4(),
             isbn=data.isbn,
@@ -156,18 +208,19 @@ class LibraryService:
             cost=data.cost,
             acquisition_date=date.today(),
             description=data.description,
-            cover_image_url=data.cover_image_url
+            cover_image_url=data.cover_image_url,
+            created_at=now,
+            updated_at=now
         )
         
         self.db.add(book)
-        await self.db.commit()
-        await self.db.refresh(book)
+        await self._commit()
         
         return book
     
     async def update_book(
         self, 
-        book_id: str, 
+        book_id: uuid.UUID, 
         data: BookUpdate
     ) -> Optional[BookCatalog]:
         """Update book"""
@@ -180,42 +233,40 @@ class LibraryService:
         for field, value in update_data.items():
             if value is not None:
                 setattr(book, field, value)
+        book.updated_at = datetime.now(timezone.utc)
         
-        await self.db.commit()
-        await self.db.refresh(book)
+        await self._commit()
         
         return book
     
-    async def delete_book(self, book_id: str) -> bool:
+    async def delete_book(self, book_id: uuid.UUID) -> bool:
         """Soft delete book"""
         book = await self.get_book_by_id(book_id)
         if not book:
             return False
         
         # Check if book has active transactions
-        active_transactions = await self.db.execute(
-            select(func.count()).select_from(
-                select(BookTransaction.id).where(and_(
-                    BookTransaction.book_id == uuid.UUID(book_id),
-                    BookTransaction.status.in_([
-                        TransactionStatus.ISSUED,
-                        TransactionStatus.OVERDUE
-                    ])
-                )).subquery()
-            )
+        has_active_transactions = await self.db.scalar(
+            select(exists().where(and_(
+                BookTransaction.book_id == book_id,
+                BookTransaction.status.in_([
+                    TransactionStatus.ISSUED,
+                    TransactionStatus.OVERDUE
+                ])
+            )))
         )
         
-        if (active_transactions.scalar() or 0) > 0:
+        if has_active_transactions:
             raise ValueError("Cannot delete book with active transactions")
         
         book.is_active = False
-        await self.db.commit()
+        await self._commit()
         
         return True
     
     # ==================== Book Copies ====================
     
-    async def add_book_copy(self, book_id: str, barcode: str, **kwargs) -> BookCopy:
+    async def add_book_copy(self, book_id: uuid.UUID, barcode: str, **kwargs) -> BookCopy:
         """Add a physical copy of a book"""
         book = await self.get_book_by_id(book_id)
         if not book:
@@ -230,7 +281,7 @@ class LibraryService:
         
         copy = BookCopy(
             id=uuid.uuid4(),
-            book_id=uuid.UUID(book_id),
+            book_id=book_id,
             barcode=barcode,
             shelf_location=kwargs.get("shelf_location") or book.shelf_location,
             condition=kwargs.get("condition", "GOOD")
@@ -241,20 +292,71 @@ class LibraryService:
         book.available_copies += 1
         
         self.db.add(copy)
-        await self.db.commit()
+        await self._commit()
         await self.db.refresh(copy)
         
         return copy
     
+    async def add_book_copies_bulk(
+        self,
+        book_id: uuid.UUID,
+        barcodes: List[str],
+        shelf_location: Optional[str] = None,
+        condition: str = "GOOD"
+    ) -> List[BookCopy]:
+        """Add many physical copies of a book in one batch"""
+        if len(set(barcodes)) != len(barcodes):
+            raise ValueError("Duplicate barcodes in request")
+        if not barcodes:
+            return []
+        
+        book = await self.get_book_by_id(book_id)
+        if not book:
+            raise ValueError(f"Book '{book_id}' not found")
+        
+        # Check all barcodes for duplicates in one query
+        existing = (await self.db.scalars(
+            select(BookCopy.barcode).where(BookCopy.barcode.in_(barcodes))
+        )).all()
+        if existing:
+            raise ValueError(f"Book copies with barcodes {', '.join(existing)} already exist")
+        
+        copies = (await self.db.scalars(
+            insert(BookCopy).returning(BookCopy),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "book_id": book_id,
+                    "barcode": barcode,
+                    "shelf_location": shelf_location or book.shelf_location,
+                    "condition": condition,
+                }
+                for barcode in barcodes
+            ]
+        )).all()
+        
+        # Update book counts
+        await self.db.execute(
+            update(BookCatalog)
+            .where(BookCatalog.id == book_id)
+            .values(
+                total_copies=BookCatalog.total_copies + len(barcodes),
+                available_copies=BookCatalog.available_copies + len(barcodes)
+            )
+        )
+        
+        await self._commit()
+        return list(copies)
+    
     # ==================== Library Members ====================
     
-    async def get_member_by_id(self, member_id: str) -> Optional[LibraryMember]:
+    async def get_member_by_id(self, member_id: uuid.UUID) -> Optional[LibraryMember]:
         """Get library member by ID"""
-        result = await self.db.execute(
-            select(LibraryMember)
-            .options(selectinload(LibraryMember.user))
-            .where(LibraryMember.id == uuid.UUID(member_id))
-        )
+        result = await self.db.execute(lambda_stmt(
+            lambda: select(LibraryMember)
+            .options(selectinload(LibraryMember.user), raiseload("*"))
+            .where(LibraryMember.id == member_id)
+        ))
         return result.scalar_one_or_none()
     
     async def get_member_by_user_id(self, user_id: int) -> Optional[LibraryMember]:
@@ -266,9 +368,9 @@ class LibraryService:
     
     async def get_member_by_card(self, card_number: str) -> Optional[LibraryMember]:
         """Get library member by card number"""
-        result = await self.db.execute(
-            select(LibraryMember).where(LibraryMember.card_number == card_number)
-        )
+        result = await self.db.execute(lambda_stmt(
+            lambda: select(LibraryMember).where(LibraryMember.card_number == card_number)
+        ))
         return result.scalar_one_or_none()
     
     async def create_member(self, user_id: int, member_type: MemberType) -> LibraryMember:
@@ -284,18 +386,20 @@ class LibraryService:
         # Generate card number
         card_number = await self._generate_card_number()
         
+        now = datetime.now(timezone.utc)
         member = LibraryMember(
             id=uuid.uuid4(),
             user_id=user_id,
             member_type=member_type,
             card_number=card_number,
             max_books=max_books,
-            max_days=max_days
+            max_days=max_days,
+            created_at=now,
+            updated_at=now
         )
         
         self.db.add(member)
-        await self.db.commit()
-        await self.db.refresh(member)
+        await self._commit()
         
         return member
     
@@ -303,31 +407,74 @@ class LibraryService:
         """Generate unique card number"""
         # Format: LIB-YYYY-XXXX
         year = datetime.utcnow().year
-        prefix = f"LIB-{year}-"
-        
-        result = await self.db.execute(
-            select(func.count()).select_from(LibraryMember)
-            .where(LibraryMember.card_number.like(f"{prefix}%"))
-        )
-        count = (result.scalar() or 0) + 1
         
-        return f"{prefix}{count:05d}"
+        # Draw from a sequence so concurrent sign-ups never share a number.
+        # The sequence is global, so numbers don't restart each year; skip any
+        # that cards issued before the sequence existed already use.
+        while True:
+            result = await self.db.execute(select(library_card_seq.next_value()))
+            card_number = f"LIB-{year}-{result.scalar_one():05d}"
+            
+            taken = await self.db.scalar(
+                select(exists().where(LibraryMember.card_number == card_number))
+            )
+            if not taken:
+                return card_number
     
     # ==================== Book Circulation ====================
     
     async def issue_book(self, request: BookIssueRequest, issued_by_id: Optional[int] = None) -> Tuple[BookTransaction, IssueReceipt]:
         """Issue a book to a member"""
-        # Get book
-        book = await self.get_book_by_id(request.book_id)
-        if not book:
+        # The book and both reservation checks come back in one statement.
+        # populate_existing keeps the checks current when a batch (autocommit=False)
+        # has already updated these rows in SQL earlier in the transaction.
+        own_reservation = (
+            select(BookReservation.id)
+            .where(and_(
+                BookReservation.book_id == request.book_id,
+                BookReservation.member_id == request.member_id,
+                BookReservation.status == ReservationStatus.ACTIVE
+            ))
+            .order_by(BookReservation.reservation_date)
+            .limit(1)
+            .scalar_subquery()
+        )
+        next_in_queue = (
+            select(BookReservation.member_id)
+            .where(and_(
+                BookReservation.book_id == request.book_id,
+                BookReservation.status == ReservationStatus.ACTIVE,
+                BookReservation.expiry_date > datetime.utcnow()
+            ))
+            .order_by(BookReservation.reservation_date)
+            .limit(1)
+            .scalar_subquery()
+        )
+        row = (await self.db.execute(
+            select(
+                BookCatalog,
+                own_reservation.label("reservation_id"),
+                next_in_queue.label("next_member_id")
+            )
+            .where(BookCatalog.id == request.book_id)
+            .execution_options(populate_existing=True)
+        )).one_or_none()
+        
+        if not row:
             raise ValueError(f"Book '{request.book_id}' not found")
+        book, reservation_id, next_member_id = row
         
         # Check availability
         if book.available_copies <= 0:
             raise ValueError(f"Book '{book.title}' is not available")
         
-        # Get member
-        member = await self.get_member_by_id(request.member_id)
+        result = await self.db.execute(
+            select(LibraryMember)
+            .options(joinedload(LibraryMember.user), raiseload("*"))
+            .where(LibraryMember.id == request.member_id)
+            .execution_options(populate_existing=True)
+        )
+        member = result.scalar_one_or_none()
         if not member:
             raise ValueError(f"Library member '{request.member_id}' not found")
         
@@ -337,32 +484,21 @@ class LibraryService:
                 raise ValueError(f"Member is suspended until {member.suspension_end_date}")
             raise ValueError(f"Member has reached maximum book limit ({member.max_books})")
         
-        # Check for existing reservation queue
-        reservation = await self._check_reservation_queue(request.book_id, request.member_id)
-        if reservation is None:
-            # Check if someone else has a reservation
-            next_reservation = await self._get_next_reservation(request.book_id)
-            if next_reservation and next_reservation.member_id != uuid.UUID(request.member_id):
+        # Without a reservation of their own, nobody else may be queued ahead
+        if reservation_id is None:
+            if next_member_id is not None and next_member_id != request.member_id:
                 raise ValueError("This book is reserved by another member")
         
         # Calculate due date
         days = request.days or member.max_days
         due_date = datetime.utcnow() + timedelta(days=days)
         
-        # Get book copy if specified
-        copy = None
-        if request.copy_id:
-            result = await self.db.execute(
-                select(BookCopy).where(BookCopy.id == uuid.UUID(request.copy_id))
-            )
-            copy = result.scalar_one_or_none()
-        
         # Create transaction
         transaction = BookTransaction(
             id=uuid.uuid4(),
-            book_id=uuid.UUID(request.book_id),
-            copy_id=uuid.UUID(request.copy_id) if request.copy_id else None,
-            member_id=uuid.UUID(request.member_id),
+            book_id=request.book_id,
+            copy_id=request.copy_id,
+            member_id=request.member_id,
             issue_date=datetime.utcnow(),
             due_date=due_date,
             status=TransactionStatus.ISSUED,
@@ -370,17 +506,49 @@ class LibraryService:
             issue_notes=request.notes
         )
         
-        # Update book and member
-        book.available_copies -= 1
-        member.current_issues += 1
+        # Update book and member by key. Each counter only moves while its limit
+        # allows, so concurrent issues cannot take the last copy twice or push a
+        # member past max_books. The savepoint undoes the book decrement if the
+        # member update is refused, without touching the caller's other work.
+        try:
+            async with self.db.begin_nested():
+                remaining = await self.db.scalar(
+                    update(BookCatalog)
+                    .where(BookCatalog.id == book.id, BookCatalog.available_copies > 0)
+                    .values(available_copies=BookCatalog.available_copies - 1)
+                    .returning(BookCatalog.available_copies)
+                )
+                if remaining is None:
+                    raise ValueError(f"Book '{book.title}' is not available")
+                
+                issued = await self.db.scalar(
+                    update(LibraryMember)
+                    .where(
+                        LibraryMember.id == member.id,
+                        LibraryMember.current_issues < LibraryMember.max_books
+                    )
+                    .values(current_issues=LibraryMember.current_issues + 1)
+                    .returning(LibraryMember.current_issues)
+                )
+                if issued is None:
+                    raise ValueError(f"Member has reached maximum book limit ({member.max_books})")
+        except ValueError:
+            await self._rollback()
+            raise
         
         # Fulfill reservation if exists
-        if reservation:
-            reservation.status = ReservationStatus.FULFILLED
-            reservation.fulfilled_date = datetime.utcnow()
+        if reservation_id is not None:
+            await self.db.execute(
+                update(BookReservation)
+                .where(BookReservation.id == reservation_id)
+                .values(
+                    status=ReservationStatus.FULFILLED,
+                    fulfilled_date=datetime.utcnow()
+                )
+            )
         
         self.db.add(transaction)
-        await self.db.commit()
+        await self._commit()
         await self.db.refresh(transaction)
         
         receipt = IssueReceipt(
@@ -398,61 +566,89 @@ class LibraryService:
         
         return transaction, receipt
     
+    @staticmethod
+    def _closing_values(now: datetime) -> dict:
+        """Column values that close a loan, with overdue status and fine computed in SQL"""
+        is_overdue = BookTransaction.due_date < now
+        status_type = BookTransaction.status.type
+        return {
+            "return_date": now,
+            "actual_return_date": now,
+            "status": case(
+                (is_overdue, literal(TransactionStatus.OVERDUE, status_type)),
+                else_=literal(TransactionStatus.RETURNED, status_type)
+            ),
+            "fine_amount": case(
+                (
+                    is_overdue,
+                    func.date_part("day", literal(now) - BookTransaction.due_date)
+                    * BookTransaction.fine_per_day
+                ),
+                else_=Decimal("0.00")
+            ),
+        }
+    
     async def return_book(self, request: BookReturnRequest, received_by_id: Optional[int] = None) -> Tuple[BookTransaction, ReturnReceipt]:
         """Return a book"""
-        # Get transaction
+        # Close the transaction and calculate any fine in the same statement
         result = await self.db.execute(
-            select(BookTransaction)
-            .options(
-                selectinload(BookTransaction.book),
-                selectinload(BookTransaction.member).selectinload(LibraryMember.user)
+            update(BookTransaction)
+            .where(
+                BookTransaction.id == request.transaction_id,
+                BookTransaction.status.notin_(self._CLOSED_STATUSES)
             )
-            .where(BookTransaction.id == uuid.UUID(request.transaction_id))
+            .values(
+                **self._closing_values(datetime.utcnow()),
+                received_by_id=received_by_id,
+                return_notes=request.condition_notes,
+                condition_on_return=request.condition
+            )
+            .returning(BookTransaction)
         )
         transaction = result.scalar_one_or_none()
         
         if not transaction:
-            raise ValueError(f"Transaction '{request.transaction_id}' not found")
-        
-        if transaction.status in [TransactionStatus.RETURNED, TransactionStatus.LOST]:
+            found = await self.db.scalar(
+                select(exists().where(BookTransaction.id == request.transaction_id))
+            )
+            await self._rollback()
+            if not found:
+                raise ValueError(f"Transaction '{request.transaction_id}' not found")
             raise ValueError(f"Book has already been returned")
         
-        # Update transaction
-        transaction.return_date = datetime.utcnow()
-        transaction.actual_return_date = datetime.utcnow()
-        transaction.status = TransactionStatus.RETURNED
-        transaction.received_by_id = received_by_id
-        transaction.return_notes = request.condition_notes
-        transaction.condition_on_return = request.condition
-        
-        # Calculate fine if overdue
-        if transaction.is_overdue:
-            transaction.fine_amount = transaction.calculate_fine()
-            transaction.status = TransactionStatus.OVERDUE
-        else:
-            transaction.fine_amount = Decimal("0.00")
-        
-        # Update book and member
-        book = transaction.book
-        member = transaction.member
-        
-        book.available_copies += 1
-        member.current_issues -= 1
+        # Update book and member counters atomically
+        book = (await self.db.execute(
+            update(BookCatalog)
+            .where(BookCatalog.id == transaction.book_id)
+            .values(available_copies=BookCatalog.available_copies + 1)
+            .returning(BookCatalog.id, BookCatalog.title, BookCatalog.isbn)
+        )).one()
+        
+        member_name = (
+            select(UserProfile.first_name + " " + UserProfile.last_name)
+            .where(UserProfile.user_id == LibraryMember.user_id)
+            .scalar_subquery()
+        )
+        member = (await self.db.execute(
+            update(LibraryMember)
+            .where(LibraryMember.id == transaction.member_id)
+            .values(current_issues=LibraryMember.current_issues - 1)
+            .returning(LibraryMember.card_number, member_name.label("member_name"))
+        )).one()
         
         # Check for next reservation
-        next_reservation = await self._get_next_reservation(str(book.id))
+        next_reservation = await self._get_next_reservation(book.id)
         if next_reservation:
             # Notify next person (in production, this would send SMS/email)
             logger.info(f"Book {book.title} reserved by member {next_reservation.member_id}")
         
-        await self.db.commit()
-        await self.db.refresh(transaction)
+        await self._commit()
         
         receipt = ReturnReceipt(
             transaction_id=str(transaction.id),
             book_title=book.title,
             book_isbn=book.isbn,
-            member_name=member.user.first_name + " " + member.user.last_name if member.user else "Unknown",
+            member_name=member.member_name or "Unknown",
             member_card=member.card_number,
             issued_date=transaction.issue_date,
             due_date=transaction.due_date,
@@ -465,12 +661,62 @@ class LibraryService:
         
         return transaction, receipt
     
+    async def bulk_return(self, tx_ids: List[uuid.UUID], received_by_id: Optional[int] = None) -> List[BookTransaction]:
+        """
+        Return a batch of books in one pass
+        
+        Overdue status and fines are computed by the database for every row,
+        and book/member counters are adjusted by the number of loans closed
+        for each. Transactions that are already closed are skipped.
+        """
+        if not tx_ids:
+            return []
+        
+        result = await self.db.execute(
+            update(BookTransaction)
+            .where(
+                BookTransaction.id.in_(tx_ids),
+                BookTransaction.status.notin_(self._CLOSED_STATUSES)
+            )
+            .values(**self._closing_values(datetime.utcnow()), received_by_id=received_by_id)
+            .returning(BookTransaction)
+        )
+        transactions = list(result.scalars())
+        if not transactions:
+            return []
+        
+        closed_ids = [tx.id for tx in transactions]
+        
+        closed = BookTransaction.id.in_(closed_ids)
+        
+        await self.db.execute(
+            update(BookCatalog)
+            .where(BookCatalog.id.in_({tx.book_id for tx in transactions}))
+            .values(available_copies=BookCatalog.available_copies + (
+                select(func.count())
+                .where(closed, BookTransaction.book_id == BookCatalog.id)
+                .scalar_subquery()
+            ))
+        )
+        await self.db.execute(
+            update(LibraryMember)
+            .where(LibraryMember.id.in_({tx.member_id for tx in transactions}))
+            .values(current_issues=LibraryMember.current_issues - (
+                select(func.count())
+                .where(closed, BookTransaction.member_id == LibraryMember.id)
+                .scalar_subquery()
+            ))
+        )
+        
+        await self._commit()
+        return transactions
+    
     async def renew_book(self, request: BookRenewRequest) -> BookTransaction:
         """Renew a book"""
         result = await self.db.execute(
             select(BookTransaction)
-            .options(selectinload(BookTransaction.book))
-            .where(BookTransaction.id == uuid.UUID(request.transaction_id))
+            .options(selectinload(BookTransaction.book), raiseload("*"))
+            .where(BookTransaction.id == request.transaction_id)
         )
         transaction = result.scalar_one_or_none()
         
@@ -490,7 +736,7 @@ class LibraryService:
             raise ValueError("Cannot renew overdue book. Please return and pay fine.")
         
         # Check for reservation queue
-        next_reservation = await self._get_next_reservation(str(transaction.book_id))
+        next_reservation = await self._get_next_reservation(transaction.book_id)
         if next_reservation and next_reservation.member_id != transaction.member_id:
             raise ValueError("Cannot renew: book reserved by another member")
         
@@ -501,17 +747,21 @@ class LibraryService:
         transaction.renewal_count += 1
         transaction.issue_notes = request.notes or transaction.issue_notes
         
-        await self.db.commit()
+        await self._commit()
         await self.db.refresh(transaction)
         
         return transaction
     
-    async def mark_as_lost(self, transaction_id: str) -> BookTransaction:
+    async def mark_as_lost(self, transaction_id: uuid.UUID) -> BookTransaction:
         """Mark a book as lost"""
         result = await self.db.execute(
             select(BookTransaction)
-            .options(selectinload(BookTransaction.member))
-            .where(BookTransaction.id == uuid.UUID(transaction_id))
+            .options(
+                selectinload(BookTransaction.book),
+                selectinload(BookTransaction.member),
+                raiseload("*")
+            )
+            .where(BookTransaction.id == transaction_id)
         )
         transaction = result.scalar_one_or_none()
         
@@ -526,7 +776,7 @@ class LibraryService:
         member.unpaid_fines += transaction.fine_amount
         member.current_issues -= 1
         
-        await self.db.commit()
+        await self._commit()
         await self.db.refresh(transaction)
         
         return transaction
@@ -553,14 +803,14 @@ class LibraryService:
             raise ValueError("Member cannot borrow books")
         
         # Check for existing active reservation
-        existing = await self.db.execute(
-            select(BookReservation).where(and_(
-                BookReservation.book_id == uuid.UUID(request.book_id),
-                BookReservation.member_id == uuid.UUID(request.member_id),
+        has_reservation = await self.db.scalar(
+            select(exists().where(and_(
+                BookReservation.book_id == request.book_id,
+                BookReservation.member_id == request.member_id,
                 BookReservation.status == ReservationStatus.ACTIVE
-            ))
+            )))
         )
-        if existing.scalar_one_or_none():
+        if has_reservation:
             raise ValueError("Member already has an active reservation for this book")
         
         # Check reservation limit
@@ -568,7 +818,7 @@ class LibraryService:
         reservation_count = await self.db.execute(
             select(func.count()).select_from(BookReservation)
             .where(and_(
-                BookReservation.member_id == uuid.UUID(request.member_id),
+                BookReservation.member_id == request.member_id,
                 BookReservation.status == ReservationStatus.ACTIVE
             ))
         )
@@ -576,27 +826,26 @@ class LibraryService:
             raise ValueError(f"Maximum reservations ({settings.max_reservations_per_member}) reached")
         
         # Calculate expiry
-        settings = await self.get_settings()
         expiry_date = datetime.utcnow() + timedelta(days=settings.reservation_expiry_days)
         
         reservation = BookReservation(
             id=uuid.uuid4(),
-            book_id=uuid.UUID(request.book_id),
-            member_id=uuid.UUID(request.member_id),
+            book_id=request.book_id,
+            member_id=request.member_id,
             expiry_date=expiry_date,
             notes=request.notes
         )
         
         self.db.add(reservation)
-        await self.db.commit()
+        await self._commit()
         await self.db.refresh(reservation)
         
         return reservation
     
-    async def cancel_reservation(self, reservation_id: str) -> BookReservation:
+    async def cancel_reservation(self, reservation_id: uuid.UUID) -> BookReservation:
         """Cancel a reservation"""
         result = await self.db.execute(
-            select(BookReservation).where(BookReservation.id == uuid.UUID(reservation_id))
+            select(BookReservation).where(BookReservation.id == reservation_id)
         )
         reservation = result.scalar_one_or_none()
         
@@ -607,18 +856,18 @@ class LibraryService:
             raise ValueError(f"Cannot cancel reservation with status: {reservation.status}")
         
         reservation.status = ReservationStatus.CANCELLED
-        await self.db.commit()
+        await self._commit()
         await self.db.refresh(reservation)
         
         return reservation
     
-    async def _check_reservation_queue(self, book_id: str, member_id: str) -> Optional[BookReservation]:
+    async def _check_reservation_queue(self, book_id: uuid.UUID, member_id: uuid.UUID) -> Optional[BookReservation]:
         """Check if member is first in reservation queue"""
         result = await self.db.execute(
             select(BookReservation)
             .where(and_(
-                BookReservation.book_id == uuid.UUID(book_id),
-                BookReservation.member_id == uuid.UUID(member_id),
+                BookReservation.book_id == book_id,
+                BookReservation.member_id == member_id,
                 BookReservation.status == ReservationStatus.ACTIVE
             ))
             .order_by(BookReservation.reservation_date)
@@ -626,59 +875,73 @@ class LibraryService:
         )
         return result.scalar_one_or_none()
     
-    async def _get_next_reservation(self, book_id: str) -> Optional[BookReservation]:
+    async def _get_next_reservation(self, book_id: uuid.UUID) -> Optional[BookReservation]:
         """Get next active reservation for a book"""
-        result = await self.db.execute(
-            select(BookReservation)
-            .options(selectinload(BookReservation.member))
+        now = datetime.utcnow()
+        result = await self.db.execute(lambda_stmt(
+            lambda: select(BookReservation)
+            .options(selectinload(BookReservation.member), raiseload("*"))
             .where(and_(
-                BookReservation.book_id == uuid.UUID(book_id),
+                BookReservation.book_id == book_id,
                 BookReservation.status == ReservationStatus.ACTIVE,
-                BookReservation.expiry_date > datetime.utcnow()
+                BookReservation.expiry_date > now
             ))
             .order_by(BookReservation.reservation_date)
             .limit(1)
-        )
+        ))
         return result.scalar_one_or_none()
     
     # ==================== Fines ====================
     
     async def pay_fine(self, request: FinePaymentRequest) -> FineRecord:
         """Pay a fine"""
-        result = await self.db.execute(
-            select(FineRecord)
-            .options(selectinload(FineRecord.member))
-            .where(FineRecord.id == uuid.UUID(request.fine_id))
+        paid_amount = func.coalesce(FineRecord.paid_amount, Decimal("0.00")) + request.amount
+        
+        # Apply the payment in SQL so concurrent payments cannot lose updates
+        fine = await self.db.scalar(
+            update(FineRecord)
+            .where(
+                FineRecord.id == request.fine_id,
+                FineRecord.status.notin_(["PAID", "WAIVED"])
+            )
+            .values(
+                paid_amount=paid_amount,
+                status=case((paid_amount >= FineRecord.amount, "PAID"), else_="PARTIAL"),
+                paid_date=datetime.utcnow(),
+                payment_method=request.payment_method,
+                reference_number=request.reference_number
+            )
+            .returning(FineRecord)
         )
-        fine = result.scalar_one_or_none()
         
         if not fine:
-            raise ValueError(f"Fine '{request.fine_id}' not found")
-        
-        if fine.status in ["PAID", "WAIVED"]:
-            raise ValueError(f"Fine already {fine.status.lower()}")
+            fine_status = await self.db.scalar(
+                select(FineRecord.status).where(FineRecord.id == request.fine_id)
+            )
+            await self._rollback()
+            if fine_status is None:
+                raise ValueError(f"Fine '{request.fine_id}' not found")
+            raise ValueError(f"Fine already {fine_status.lower()}")
         
-        fine.paid_amount += request.amount
-        fine.status = "PAID" if fine.paid_amount >= fine.amount else "PARTIAL"
-        fine.paid_date = datetime.utcnow()
-        fine.payment_method = request.payment_method
-        fine.reference_number = request.reference_number
+        # Only the part of the payment that was still outstanding reduces the balance
+        outstanding = fine.amount - (fine.paid_amount - request.amount)
+        applied = min(request.amount, outstanding)
         
         # Update member
-        member = fine.member
-        member.unpaid_fines -= min(request.amount, fine.amount - fine.paid_amount)
+        await self.db.execute(
+            update(LibraryMember)
+            .where(LibraryMember.id == fine.member_id)
+            .values(unpaid_fines=LibraryMember.unpaid_fines - applied)
+        )
         
-        await self.db.commit()
-        await self.db.refresh(fine)
+        await self._commit()
         
         return fine
     
     async def waive_fine(self, request: FineWaiveRequest, waived_by_id: int) -> FineRecord:
         """Waive a fine"""
         result = await self.db.execute(
-            select(FineRecord)
-            .options(selectinload(FineRecord.member))
-            .where(FineRecord.id == uuid.UUID(request.fine_id))
+            select(FineRecord).where(FineRecord.id == request.fine_id)
         )
         fine = result.scalar_one_or_none()
         
@@ -694,98 +957,115 @@ class LibraryService:
         fine.waived_date = datetime.utcnow()
         
         # Update member
-        member = fine.member
-        member.unpaid_fines -= fine.amount
+        await self.db.execute(
+            update(LibraryMember)
+            .where(LibraryMember.id == fine.member_id)
+            .values(unpaid_fines=LibraryMember.unpaid_fines - fine.amount)
+        )
+        fine.updated_at = datetime.now(timezone.utc)
         
-        await self.db.commit()
-        await self.db.refresh(fine)
+        await self._commit()
         
         return fine
     
     # ==================== Reports ====================
     
-    async def get_overdue_report(self) -> List[OverdueItem]:
+    async def get_overdue_report(self) -> List[OverdueItemRow]:
         """Get all overdue items"""
-        result = await self.db.execute(
-            select(BookTransaction)
-            .options(
-                selectinload(BookTransaction.book),
-                selectinload(BookTransaction.member).selectinload(LibraryMember.user)
+        now = datetime.utcnow()
+        
+        # Overdue filter runs in SQL (due_date is naive UTC, like is_overdue),
+        # so only overdue loans are fetched, not every open loan. Only the
+        # report columns are selected, with the member name and overdue days
+        # computed by the database. Rows arrive in batches and become slotted
+        # dataclasses as they come; the report itself is still built in full.
+        result = await self.db.stream(
+            select(
+                BookTransaction.id,
+                BookTransaction.book_id,
+                BookTransaction.member_id,
+                BookTransaction.due_date,
+                BookTransaction.fine_amount,
+                BookTransaction.status,
+                BookCatalog.title,
+                BookCatalog.isbn,
+                LibraryMember.card_number,
+                func.coalesce(UserProfile.first_name + " " + UserProfile.last_name, "Unknown").label("member_name"),
+                func.date_part("day", literal(now) - BookTransaction.due_date).label("overdue_days")
             )
-            .where(BookTransaction.status.in_([TransactionStatus.ISSUED, TransactionStatus.OVERDUE]))
+            .join(BookCatalog, BookCatalog.id == BookTransaction.book_id)
+            .join(LibraryMember, LibraryMember.id == BookTransaction.member_id)
+            .outerjoin(UserProfile, UserProfile.user_id == LibraryMember.user_id)
+            .where(and_(
+                BookTransaction.status.in_([TransactionStatus.ISSUED, TransactionStatus.OVERDUE]),
+                BookTransaction.due_date < now
+            ))
             .order_by(BookTransaction.due_date)
+            .execution_options(yield_per=1000)
         )
-        transactions = result.scalars().all()
         
         overdue_items = []
-        for tx in transactions:
-            if tx.is_overdue:
-                overdue_items.append(OverdueItem(
-                    transaction_id=str(tx.id),
-                    book_id=str(tx.book_id),
-                    book_title=tx.book.title,
-                    book_isbn=tx.book.isbn,
-                    member_id=str(tx.member_id),
-                    member_card=tx.member.card_number,
-                    member_name=tx.member.user.first_name + " " + tx.member.user.last_name if tx.member.user else "Unknown",
-                    due_date=tx.due_date,
-                    overdue_days=tx.overdue_days,
-                    fine_amount=tx.fine_amount,
-                    status=tx.status.value
-                ))
+        async for row in result:
+            overdue_items.append(OverdueItemRow(
+                transaction_id=str(row.id),
+                book_id=str(row.book_id),
+                book_title=row.title,
+                book_isbn=row.isbn,
+                member_id=str(row.member_id),
+                member_card=row.card_number,
+                member_name=row.member_name,
+                due_date=row.due_date,
+                overdue_days=int(row.overdue_days),
+                fine_amount=row.fine_amount,
+                status=row.status.value
+            ))
         
         return overdue_items
     
     async def get_stats(self) -> dict:
         """Get library statistics"""
-        # Book stats
-        books_result = await self.db.execute(
-            select(
-                func.count(BookCatalog.id),
-                func.sum(BookCatalog.total_copies),
-                func.sum(BookCatalog.available_copies)
-            ).where(BookCatalog.is_active == True)
-        )
-        books_row = books_result.first()
+        # One single-row aggregate per table, cross-joined into one statement
+        books = select(
+            func.count(BookCatalog.id).label("total_books"),
+            func.sum(BookCatalog.total_copies).label("total_copies"),
+            func.sum(BookCatalog.available_copies).label("available_copies")
+        ).where(BookCatalog.is_active == True).subquery()
+        
+        members = select(
+            func.count(LibraryMember.id).label("total_members"),
+            func.count().filter(
+                LibraryMember.status == MemberStatus.ACTIVE
+            ).label("active_members")
+        ).subquery()
+        
+        transactions = select(
+            func.count(BookTransaction.id).label("total_transactions"),
+            func.count().filter(BookTransaction.status.in_([
+                TransactionStatus.ISSUED, TransactionStatus.OVERDUE
+            ])).label("active_transactions"),
+            func.count().filter(
+                BookTransaction.status == TransactionStatus.OVERDUE
+            ).label("overdue_count"),
+            func.sum(BookTransaction.fine_amount - BookTransaction.fine_paid).filter(
+                BookTransaction.fine_status.in_(["PENDING", "PARTIAL"])
+            ).label("total_fines_pending")
+        ).subquery()
         
-        # Member stats
-        members_result = await self.db.execute(
-            select(
-                func.count(LibraryMember.id),
-                func.count().where(LibraryMember.status == MemberStatus.ACTIVE)
-            )
-        )
-        members_row = members_result.first()
-        
-        # Transaction stats
-        tx_result = await self.db.execute(
-            select(
-                func.count(BookTransaction.id),
-                func.count().where(BookTransaction.status.in_([
-                    TransactionStatus.ISSUED, TransactionStatus.OVERDUE
-                ]))
-            )
-        )
-        tx_row = tx_result.first()
-        
-        # Overdue and fines
-        overdue_result = await self.db.execute(
-            select(
-                func.count().where(BookTransaction.status == TransactionStatus.OVERDUE),
-                func.sum(BookTransaction.fine_amount - BookTransaction.fine_paid)
-                .where(BookTransaction.fine_status.in_(["PENDING", "PARTIAL"]))
+        result = await self.db.execute(
+            select(books, members, transactions).select_from(
+                books.join(members, true()).join(transactions, true())
             )
         )
-        overdue_row = overdue_result.first()
+        row = result.one()
         
         return {
-            "total_books": books_row[0] or 0,
-            "total_copies": books_row[1] or 0,
-            "available_copies": books_row[2] or 0,
-            "total_members": members_row[0] or 0,
-            "active_members": members_row[1] or 0,
-            "total_transactions": tx_row[0] or 0,
-            "active_transactions": tx_row[1] or 0,
-            "overdue_count": overdue_row[0] or 0,
-            "total_fines_pending": overdue_row[1] or Decimal("0.00")
+            "total_books": row.total_books or 0,
+            "total_copies": row.total_copies or 0,
+            "available_copies": row.available_copies or 0,
+            "total_members": row.total_members or 0,
+            "active_members": row.active_members or 0,
+            "total_transactions": row.total_transactions or 0,
+            "active_transactions": row.active_transactions or 0,
+            "overdue_count": row.overdue_count or 0,
+            "total_fines_pending": row.total_fines_pending or Decimal("0.00")
         }
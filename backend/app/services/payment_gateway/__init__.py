@@ -3,15 +3,35 @@ Payment Gateway Package
 Implements provider pattern for flexible payment processing
 """
 
-from app.services.payment_gateway.base import PaymentProviderBase, PaymentProviderType, PaymentResult, ProviderConfig
-from app.services.payment_gateway.manual_provider import ManualPaymentProvider, BankTransferProvider
-from app.services.payment_gateway.stripe_provider import StripePaymentProvider
+import importlib
+from typing import Any
+
+from app.services.payment_gateway.base import (
+    PaymentProviderBase, PaymentProviderType, PaymentResult, ProviderConfig, resolve_provider
+)
+from app.services.payment_gateway.registry import get_provider
+
+# Provider classes are imported on first access so their SDKs load lazily
+_LAZY_PROVIDERS = {
+    "ManualPaymentProvider": "app.services.payment_gateway.manual_provider",
+    "BankTransferProvider": "app.services.payment_gateway.manual_provider",
+    "StripePaymentProvider": "app.services.payment_gateway.stripe_provider",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_PROVIDERS:
+        return getattr(importlib.import_module(_LAZY_PROVIDERS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "PaymentProviderBase", 
     "PaymentProviderType", 
     "PaymentResult", 
     "ProviderConfig",
+    "resolve_provider",
+    "get_provider",
     "ManualPaymentProvider", 
     "BankTransferProvider",
     "StripePaymentProvider"
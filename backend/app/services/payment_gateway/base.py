@@ -23,7 +23,31 @@ class PaymentProviderType(str, Enum):
     BANK = "bank"          # Free - Bank transfer recording
 
 
-@dataclass
+# Prefixes of the transaction IDs each provider issues
+TRANSACTION_ID_PREFIXES: Dict[str, PaymentProviderType] = {
+    "MANUAL-": PaymentProviderType.MANUAL,
+    "BANK-": PaymentProviderType.BANK,
+    "pi_": PaymentProviderType.STRIPE,
+}
+_ALL_TRANSACTION_ID_PREFIXES = tuple(TRANSACTION_ID_PREFIXES)
+
+
+def resolve_provider(transaction_id: str) -> Optional[PaymentProviderType]:
+    """
+    Identify the provider that issued a transaction ID
+    
+    Returns:
+        The provider type, or None if the ID has no known prefix
+    """
+    if not transaction_id.startswith(_ALL_TRANSACTION_ID_PREFIXES):
+        return None
+    for prefix, provider_type in TRANSACTION_ID_PREFIXES.items():
+        if transaction_id.startswith(prefix):
+            return provider_type
+    return None
+
+
+@dataclass(slots=True, frozen=True)
 class PaymentResult:
     """Result from payment processing"""
     success: bool
@@ -107,9 +131,17 @@ class PaymentProviderBase(ABC):
             True if provider can process payments
         """
         pass
+    
+    def start_workers(self) -> None:
+        """Start background tasks the provider needs; called once from the app lifespan"""
+        pass
+    
+    async def aclose(self) -> None:
+        """Release network clients and background tasks held by the provider"""
+        pass
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProviderConfig:
     """Configuration for a payment provider"""
     provider_type: PaymentProviderType
@@ -7,7 +7,8 @@ without any transaction fees. Ideal for schools that handle significant cash tra
 Budget-friendly: $0 per transaction
 """
 
-import uuid
+import base64
+import secrets
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional, Dict, Any
@@ -16,10 +17,17 @@ from app.services.payment_gateway.base import (
     PaymentProviderBase,
     PaymentProviderType,
     PaymentResult,
-    ProviderConfig
+    ProviderConfig,
+    resolve_provider
 )
 
 
+def _transaction_id(prefix: str, timestamp: str) -> str:
+    """Build a PREFIX-TIMESTAMP-XXXXXXXX transaction ID with a random suffix"""
+    # 40 random bits encode to exactly 8 base32 characters, with no padding
+    return f"{prefix}-{timestamp}-{base64.b32encode(secrets.token_bytes(5)).decode('ascii')}"
+
+
 class ManualPaymentProvider(PaymentProviderBase):
     """
     Manual payment provider for recording offline payments.
@@ -78,9 +86,9 @@ class ManualPaymentProvider(PaymentProviderBase):
             )
         
         # Generate unique transaction ID
-        # Format: MANUAL-YYYYMMDD-XXXXX
-        timestamp = datetime.now().strftime("%Y%m%d")
-        transaction_id = f"MANUAL-{timestamp}-{uuid.uuid4().hex[:8].upper()}"
+        # Format: MANUAL-YYYYMMDD-XXXXXXXX
+        now = datetime.now()
+        transaction_id = _transaction_id("MANUAL", now.strftime("%Y%m%d"))
         
         return PaymentResult(
             success=True,
@@ -89,10 +97,10 @@ class ManualPaymentProvider(PaymentProviderBase):
             message="Payment recorded successfully",
             provider_data={
                 "provider_type": "manual",
-                "recorded_at": datetime.now().isoformat(),
+                "recorded_at": now.isoformat(),
                 "reference": reference,
                 "currency": currency,
-                "amount": float(amount),
+                "amount": str(amount),
                 "metadata": metadata or {}
             }
         )
@@ -110,7 +118,7 @@ class ManualPaymentProvider(PaymentProviderBase):
         with negative amounts.
         """
         # Verify this is a manual transaction
-        if not transaction_id.startswith("MANUAL-"):
+        if resolve_provider(transaction_id) is not self.provider_type:
             return PaymentResult(
                 success=False,
                 message="Transaction ID does not match manual payment format",
@@ -118,8 +126,8 @@ class ManualPaymentProvider(PaymentProviderBase):
             )
         
         # Generate refund transaction ID
-        timestamp = datetime.now().strftime("%Y%m%d")
-        refund_id = f"REFUND-{timestamp}-{uuid.uuid4().hex[:8].upper()}"
+        now = datetime.now()
+        refund_id = _transaction_id("REFUND", now.strftime("%Y%m%d"))
         
         return PaymentResult(
             success=True,
@@ -128,9 +136,9 @@ class ManualPaymentProvider(PaymentProviderBase):
             message="Refund recorded successfully",
             provider_data={
                 "original_transaction": transaction_id,
-                "refund_amount": float(amount) if amount else "full",
+                "refund_amount": str(amount) if amount else "full",
                 "refund_reason": reason,
-                "refunded_at": datetime.now().isoformat()
+                "refunded_at": now.isoformat()
             }
         )
     
@@ -142,7 +150,7 @@ class ManualPaymentProvider(PaymentProviderBase):
         since all recorded payments are considered valid.
         """
         # Check format
-        if not transaction_id.startswith("MANUAL-"):
+        if resolve_provider(transaction_id) is not self.provider_type:
             return PaymentResult(
                 success=False,
                 message="Invalid transaction ID format",
@@ -203,8 +211,8 @@ class BankTransferProvider(PaymentProviderBase):
             )
         
         # Generate transaction ID with BANK prefix
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        transaction_id = f"BANK-{timestamp}-{uuid.uuid4().hex[:6].upper()}"
+        now = datetime.now()
+        transaction_id = _transaction_id("BANK", now.strftime("%Y%m%d%H%M%S"))
         
         bank_ref = metadata.get("bank_reference", "") if metadata else ""
         
@@ -215,11 +223,11 @@ class BankTransferProvider(PaymentProviderBase):
             message="Bank transfer recorded successfully",
             provider_data={
                 "provider_type": "bank_transfer",
-                "recorded_at": datetime.now().isoformat(),
+                "recorded_at": now.isoformat(),
                 "reference": reference,
                 "bank_reference": bank_ref,
                 "currency": currency,
-                "amount": float(amount)
+                "amount": str(amount)
             }
         )
     
@@ -230,15 +238,14 @@ class BankTransferProvider(PaymentProviderBase):
         reason: Optional[str] = None
     ) -> PaymentResult:
         """Process bank transfer refund"""
-        if not transaction_id.startswith("BANK-"):
+        if resolve_provider(transaction_id) is not self.provider_type:
             return PaymentResult(
                 success=False,
                 message="Invalid bank transaction ID",
                 error_code="INVALID_TRANSACTION"
             )
         
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        refund_id = f"BANK-REF-{timestamp}"
+        refund_id = _transaction_id("BANK-REF", datetime.now().strftime("%Y%m%d%H%M%S"))
         
         return PaymentResult(
             success=True,
@@ -247,13 +254,13 @@ class BankTransferProvider(PaymentProviderBase):
             message="Bank refund recorded",
             provider_data={
                 "original_transaction": transaction_id,
-                "refund_amount": float(amount) if amount else "full"
+                "refund_amount": str(amount) if amount else "full"
             }
         )
     
     async def verify_payment(self, transaction_id: str) -> PaymentResult:
         """Verify bank transfer"""
-        if not transaction_id.startswith("BANK-"):
+        if resolve_provider(transaction_id) is not self.provider_type:
             return PaymentResult(
                 success=False,
                 error_code="INVALID_FORMAT"
@@ -0,0 +1,55 @@
+"""
+Payment Provider Registry
+
+Maps provider types to their implementation and creates each provider on
+first use, so a provider's SDK (e.g. stripe) is only imported by
+deployments that actually route payments to it.
+"""
+
+import importlib
+from typing import Dict, Optional
+
+from app.config import settings
+from app.services.payment_gateway.base import PaymentProviderBase, PaymentProviderType
+
+
+# Provider type -> "module:ClassName"
+_REGISTRY: Dict[PaymentProviderType, str] = {
+    PaymentProviderType.MANUAL: "app.services.payment_gateway.manual_provider:ManualPaymentProvider",
+    PaymentProviderType.BANK: "app.services.payment_gateway.manual_provider:BankTransferProvider",
+    PaymentProviderType.STRIPE: "app.services.payment_gateway.stripe_provider:StripePaymentProvider",
+}
+
+# Providers created so far, shared by all callers
+_instances: Dict[PaymentProviderType, PaymentProviderBase] = {}
+
+
+def get_provider(provider_type: PaymentProviderType) -> Optional[PaymentProviderBase]:
+    """
+    Get the shared provider instance for a provider type
+
+    Returns:
+        The provider, or None if no implementation is registered
+    """
+    provider = _instances.get(provider_type)
+    if provider is None:
+        target = _REGISTRY.get(provider_type)
+        if target is None:
+            return None
+        module_name, class_name = target.split(":")
+        provider = _instances[provider_type] = getattr(importlib.import_module(module_name), class_name)()
+    return provider
+
+
+def start_provider_workers() -> None:
+    """Start the background workers of configured providers (app startup)"""
+    # Only Stripe has workers; skip it entirely when unconfigured so its SDK isn't imported
+    if getattr(settings, "STRIPE_SECRET_KEY", None):
+        get_provider(PaymentProviderType.STRIPE).start_workers()
+
+
+async def close_providers() -> None:
+    """Close every provider created so far"""
+    while _instances:
+        _, provider = _instances.popitem()
+        await provider.aclose()
@@ -8,12 +8,28 @@ Budget: 2.9% + ₹3 per successful card transaction (Industry standard)
 Free for test mode transactions
 """
 
+import asyncio
+import json
+import logging
+import ssl
+import uuid
+import weakref
+import httpx
 import stripe
-from decimal import Decimal
-from datetime import datetime
-from typing import Optional, Dict, Any
+from cachetools import TTLCache
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Dict, Any, List, Tuple, TypeVar
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.config import settings
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.rate_limit import AsyncTokenBucket
+from app.db.database import async_session_maker
+from app.db.models.payment_gateway import PaymentIntentStatus, PendingPayment, PendingPaymentStatus
 from app.services.payment_gateway.base import (
     PaymentProviderBase,
     PaymentProviderType,
@@ -21,6 +37,112 @@ from app.services.payment_gateway.base import (
     ProviderConfig
 )
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Retry policy for rate limits (including object lock timeouts) and network errors
+STRIPE_MAX_ATTEMPTS = 5
+STRIPE_MAX_BACKOFF_SECONDS = 16.0
+
+# Connection pool to api.stripe.com. HTTP/2 multiplexes concurrent calls over
+# a few connections, so bursts don't pay a TLS handshake per request.
+STRIPE_MAX_CONNECTIONS = 50
+STRIPE_TIMEOUT_SECONDS = 30.0
+
+# Fail fast once this many calls in a row hit network errors or Stripe 5xx
+# responses, probing again after the timeout
+STRIPE_BREAKER_THRESHOLD = 5
+STRIPE_BREAKER_RESET_SECONDS = 30.0
+
+# Client-side pacing, kept under Stripe's ~100 requests/second account limit
+STRIPE_WRITE_RATE_PER_SECOND = 60
+STRIPE_READ_RATE_PER_SECOND = 30
+
+# verify_payment results are reused briefly while a payment is in flight and
+# for much longer once it has settled, since terminal states never change
+VERIFY_CACHE_TTL_SECONDS = 5
+VERIFY_FINAL_CACHE_TTL_SECONDS = 3600
+FINAL_PAYMENT_INTENT_STATUSES = frozenset({"succeeded", "canceled"})
+
+# Stripe PaymentIntent status -> our payment status
+PAYMENT_INTENT_STATUS_MAP = {
+    "succeeded": "completed",
+    "processing": "pending",
+    "requires_payment_method": "pending",
+    "requires_confirmation": "pending",
+    "requires_action": "pending",
+    "canceled": "cancelled",
+}
+
+# Webhook-fed local state younger than this is trusted without asking Stripe;
+# final states are trusted regardless of age
+LOCAL_STATUS_MAX_AGE_SECONDS = 300
+
+# Background workers creating queued PaymentIntents; overall pace is still set by the write limiter
+INTENT_WORKER_CONCURRENCY = 20
+
+# Idle workers check for payments queued by other processes this often
+INTENT_POLL_SECONDS = 5.0
+
+# Concurrent creations in process_payments; overall pace is still set by the write limiter
+PAYMENT_BULK_CONCURRENCY = 20
+
+# Concurrent retrievals in verify_payments_bulk; overall pace is still set by the read limiter
+VERIFY_BULK_CONCURRENCY = 20
+
+
+def _to_minor_units(amount: Decimal) -> int:
+    """Convert an amount to the smallest currency unit (paise for INR), rounding half up"""
+    return int((amount * 100).to_integral_value(ROUND_HALF_UP))
+
+
+class _PooledHTTPXClient(stripe.HTTPClient):
+    """
+    Async-only Stripe transport on an HTTP/2 httpx pool sized for bursts
+    
+    Implements the SDK's public HTTPClient interface around an AsyncClient
+    configured through its own constructor, so no SDK internals are touched.
+    Synchronous calls are not supported.
+    """
+    name = "httpx-pooled"
+    
+    def __init__(self):
+        super().__init__()
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=STRIPE_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=STRIPE_MAX_CONNECTIONS,
+                max_keepalive_connections=STRIPE_MAX_CONNECTIONS
+            ),
+            verify=ssl.create_default_context(cafile=stripe.ca_bundle_path)
+        )
+    
+    async def _send(self, method: str, url: str, headers, post_data, stream: bool) -> httpx.Response:
+        request = self._client.build_request(method, url, headers=headers, content=post_data)
+        try:
+            return await self._client.send(request, stream=stream)
+        except httpx.HTTPError as e:
+            raise stripe.error.APIConnectionError(
+                f"Network error communicating with Stripe: {type(e).__name__}",
+                should_retry=True
+            ) from e
+    
+    async def request_async(self, method, url, headers, post_data=None):
+        response = await self._send(method, url, headers, post_data, stream=False)
+        return response.content, response.status_code, response.headers
+    
+    async def request_stream_async(self, method, url, headers, post_data=None):
+        response = await self._send(method, url, headers, post_data, stream=True)
+        return response.aiter_bytes(), response.status_code, response.headers
+    
+    def sleep_async(self, secs: float) -> Awaitable[None]:
+        return asyncio.sleep(secs)
+    
+    async def close_async(self) -> None:
+        await self._client.aclose()
+
 
 class StripePaymentProvider(PaymentProviderBase):
     """
@@ -52,14 +174,97 @@ class StripePaymentProvider(PaymentProviderBase):
             }
         )
         
-        # Initialize Stripe with API key
-        if self.config.config.get("api_key"):
-            stripe.api_key = self.config.config["api_key"]
+        # Stripe client bound to this provider's key. Its HTTPX transport keeps
+        # one pooled HTTP/2 AsyncClient, so calls don't block the event loop.
+        api_key = self.config.config.get("api_key")
+        self._http_client = _PooledHTTPXClient() if api_key else None
+        self._client = (
+            stripe.StripeClient(
+                api_key,
+                http_client=self._http_client,
+                max_network_retries=0  # retries are handled by _with_retry
+            )
+            if api_key else None
+        )
+        self._write_limiter = AsyncTokenBucket(STRIPE_WRITE_RATE_PER_SECOND)
+        self._read_limiter = AsyncTokenBucket(STRIPE_READ_RATE_PER_SECOND)
+        self._breaker = CircuitBreaker(
+            "Stripe", STRIPE_BREAKER_THRESHOLD, STRIPE_BREAKER_RESET_SECONDS
+        )
+        
+        self._verify_cache: TTLCache = TTLCache(maxsize=10_000, ttl=VERIFY_CACHE_TTL_SECONDS)
+        self._verify_final_cache: TTLCache = TTLCache(maxsize=10_000, ttl=VERIFY_FINAL_CACHE_TTL_SECONDS)
+        # One lock per transaction being verified, so concurrent lookups share a single fetch
+        self._verify_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        
+        # PaymentIntent workers, started from the app lifespan; pulsed on enqueue
+        self._intent_wakeup = asyncio.Event()
+        self._intent_workers: List[asyncio.Task] = []
     
     @property
     def provider_type(self) -> PaymentProviderType:
         return PaymentProviderType.STRIPE
     
+    async def _with_retry(
+        self,
+        call: Callable[[], Awaitable[T]],
+        limiter: AsyncTokenBucket,
+        max_attempts: int = STRIPE_MAX_ATTEMPTS
+    ) -> T:
+        """
+        Run a Stripe call, retrying rate limits and connection errors
+        
+        Every attempt first takes a token from the given limiter (the write
+        bucket for mutations, the read bucket for retrievals). On failure it
+        waits for the Retry-After header when Stripe sends one, otherwise
+        backs off exponentially (1s, 2s, 4s, ... capped at 16s). Mutating
+        calls must pass the same idempotency key on every attempt, so a
+        retried request that did reach Stripe is not applied twice.
+        
+        Raises:
+            CircuitOpenError: If Stripe has been failing and the circuit
+                breaker is rejecting calls
+        """
+        for attempt in range(max_attempts - 1):
+            try:
+                return await self._guarded(call, limiter)
+            except (stripe.error.RateLimitError, stripe.error.APIConnectionError) as e:
+                headers = e.headers or {}
+                retry_after = float(headers.get("retry-after") or headers.get("Retry-After") or 0)
+                delay = max(retry_after, min(STRIPE_MAX_BACKOFF_SECONDS, 2 ** attempt))
+                logger.warning(
+                    f"Stripe request failed ({type(e).__name__}), "
+                    f"retrying in {delay:.0f}s (attempt {attempt + 1}/{max_attempts})"
+                )
+                await asyncio.sleep(delay)
+        
+        # Last attempt; errors propagate to the caller
+        return await self._guarded(call, limiter)
+    
+    async def _guarded(self, call: Callable[[], Awaitable[T]], limiter: AsyncTokenBucket) -> T:
+        """Make one Stripe call through the circuit breaker and rate limiter"""
+        self._breaker.before_call()
+        await limiter.acquire()
+        try:
+            result = await call()
+        except (stripe.error.APIConnectionError, stripe.error.APIError):
+            self._breaker.record_failure()
+            raise
+        except stripe.error.StripeError:
+            # Any other error is still an answer from Stripe
+            self._breaker.record_success()
+            raise
+        self._breaker.record_success()
+        return result
+    
+    def _unavailable(self) -> PaymentResult:
+        """Result for calls rejected while the circuit breaker is open"""
+        return PaymentResult(
+            success=False,
+            message="Stripe is temporarily unavailable. Please try again shortly.",
+            error_code="STRIPE_UNAVAILABLE"
+        )
+    
     async def process_payment(
         self,
         amount: Decimal,
@@ -77,47 +282,75 @@ class StripePaymentProvider(PaymentProviderBase):
         
         This method handles the server-side portion.
         """
-        # Validate Stripe is configured
-        if not stripe.api_key:
-            return PaymentResult(
-                success=False,
-                message="Stripe is not configured. Add STRIPE_SECRET_KEY to .env",
-                error_code="STRIPE_NOT_CONFIGURED"
-            )
+        rejection = self._validate_payment(amount)
+        if rejection:
+            return rejection
         
-        # Validate amount
-        if amount < self.config.min_amount:
-            return PaymentResult(
-                success=False,
-                message=f"Amount must be at least {self.config.min_amount}",
-                error_code="INVALID_AMOUNT"
-            )
+        return await self._create_intent(
+            amount, currency, reference, metadata,
+            {"created_at": datetime.now().isoformat()}
+        )
+    
+    async def process_payments(
+        self,
+        items: List[Tuple[Decimal, str, str, Optional[Dict[str, Any]]]]
+    ) -> List[PaymentResult]:
+        """
+        Create PaymentIntents for a batch of (amount, currency, reference, metadata)
         
-        if self.config.max_amount and amount > self.config.max_amount:
-            return PaymentResult(
-                success=False,
-                message=f"Amount exceeds maximum limit of {self.config.max_amount}",
-                error_code="AMOUNT_TOO_HIGH"
-            )
+        Metadata shared by the whole batch is built once, and intents are
+        created with bounded concurrency. Results are in input order.
+        """
+        shared_metadata = {"created_at": datetime.now().isoformat()}
+        semaphore = asyncio.Semaphore(PAYMENT_BULK_CONCURRENCY)
+        
+        async def process_one(
+            amount: Decimal, currency: str, reference: str, metadata: Optional[Dict[str, Any]]
+        ) -> PaymentResult:
+            rejection = self._validate_payment(amount)
+            if rejection:
+                return rejection
+            async with semaphore:
+                return await self._create_intent(amount, currency, reference, metadata, shared_metadata)
         
+        return list(await asyncio.gather(*(process_one(*item) for item in items)))
+    
+    async def _create_intent(
+        self,
+        amount: Decimal,
+        currency: str,
+        reference: str,
+        metadata: Optional[Dict[str, Any]],
+        shared_metadata: Dict[str, str]
+    ) -> PaymentResult:
+        """Create a PaymentIntent for an already validated payment"""
         try:
             # Convert amount to smallest currency unit (paise for INR)
-            amount_in_smallest_unit = int(amount * 100)
+            amount_in_smallest_unit = _to_minor_units(amount)
             
             # Create PaymentIntent
-            payment_intent = stripe.PaymentIntent.create(
-                amount=amount_in_smallest_unit,
-                currency=currency.lower(),
-                description=reference,
-                metadata={
+            options = {"idempotency_key": uuid.uuid4().hex}
+            payment_intent = await self._with_retry(lambda: self._client.v1.payment_intents.create_async(params={
+                "amount": amount_in_smallest_unit,
+                "currency": currency.lower(),
+                "description": reference,
+                "metadata": {
                     **(metadata or {}),
                     "schoolops_reference": reference,
-                    "created_at": datetime.now().isoformat()
+                    **shared_metadata
                 },
-                automatic_payment_methods={
+                "automatic_payment_methods": {
                     "enabled": True,
                 }
-            )
+            }, options=options), self._write_limiter)
+            
+            # Register the intent locally; webhooks keep it current from here on
+            try:
+                await self._record_intent(
+                    payment_intent, datetime.fromtimestamp(payment_intent.created, timezone.utc)
+                )
+            except SQLAlchemyError as e:
+                logger.warning(f"Could not record PaymentIntent {payment_intent.id}: {e}")
             
             return PaymentResult(
                 success=True,
@@ -126,7 +359,7 @@ class StripePaymentProvider(PaymentProviderBase):
                 message="Payment intent created. Complete payment from client.",
                 provider_data={
                     "client_secret": payment_intent.client_secret,
-                    "amount": float(amount),
+                    "amount": str(amount),
                     "currency": currency,
                     "status": payment_intent.status
                 }
@@ -152,6 +385,8 @@ class StripePaymentProvider(PaymentProviderBase):
                 message="Stripe authentication failed. Check API keys.",
                 error_code="AUTH_FAILED"
             )
+        except CircuitOpenError:
+            return self._unavailable()
         except Exception as e:
             return PaymentResult(
                 success=False,
@@ -159,6 +394,185 @@ class StripePaymentProvider(PaymentProviderBase):
                 error_code="PROCESSING_ERROR"
             )
     
+    def _validate_payment(self, amount: Decimal) -> Optional[PaymentResult]:
+        """Return a failed result if a payment can't be created, None if it can"""
+        # Validate Stripe is configured
+        if self._client is None:
+            return PaymentResult(
+                success=False,
+                message="Stripe is not configured. Add STRIPE_SECRET_KEY to .env",
+                error_code="STRIPE_NOT_CONFIGURED"
+            )
+        
+        # Validate amount
+        if amount < self.config.min_amount:
+            return PaymentResult(
+                success=False,
+                message=f"Amount must be at least {self.config.min_amount}",
+                error_code="INVALID_AMOUNT"
+            )
+        
+        if self.config.max_amount and amount > self.config.max_amount:
+            return PaymentResult(
+                success=False,
+                message=f"Amount exceeds maximum limit of {self.config.max_amount}",
+                error_code="AMOUNT_TOO_HIGH"
+            )
+        
+        return None
+    
+    async def enqueue_payment(
+        self,
+        amount: Decimal,
+        currency: str,
+        reference: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> PaymentResult:
+        """
+        Queue a PaymentIntent for creation in the background
+        
+        For non-interactive flows such as school-wide fee posting, where
+        creating thousands of intents inline would dominate the request.
+        The payment is stored in pending_payments and created by whichever
+        process's workers claim it first. Returns straight away with a
+        pending_payment_id; poll verify_pending_payment with it to get the
+        outcome.
+        """
+        rejection = self._validate_payment(amount)
+        if rejection:
+            return rejection
+        
+        pending = PendingPayment(
+            reference=reference,
+            amount=amount,
+            currency=currency,
+            payment_metadata=json.dumps(metadata) if metadata else None
+        )
+        async with async_session_maker() as session:
+            session.add(pending)
+            await session.commit()
+        
+        # Wake idle workers in this process; others find it on their next poll
+        self._intent_wakeup.set()
+        self._intent_wakeup.clear()
+        
+        return PaymentResult(
+            success=True,
+            status="pending",
+            message="Payment queued. Poll verify_pending_payment for the transaction.",
+            provider_data={
+                "pending_payment_id": str(pending.id),
+                "amount": str(amount),
+                "currency": currency
+            }
+        )
+    
+    def start_workers(self) -> None:
+        """
+        Start the PaymentIntent workers for this process
+        
+        Called once from the app lifespan. Workers claim rows in the
+        database with FOR UPDATE SKIP LOCKED, so every process may run them
+        and each queued payment is still sent to Stripe only once.
+        """
+        if self._client is None or self._intent_workers:
+            return
+        
+        self._intent_workers = [
+            asyncio.create_task(self._intent_worker()) for _ in range(INTENT_WORKER_CONCURRENCY)
+        ]
+    
+    async def _intent_worker(self) -> None:
+        """Create queued PaymentIntents until cancelled"""
+        while True:
+            pending = None
+            try:
+                pending = await self._claim_pending_payment()
+                if pending is not None:
+                    await self._create_queued_intent(pending)
+            except Exception:
+                # Keep the worker alive; a payment that failed mid-way stays PROCESSING
+                logger.exception(
+                    f"Failed to create PaymentIntent for pending payment "
+                    f"{pending.id if pending is not None else '(claim)'}"
+                )
+            
+            if pending is None:
+                try:
+                    await asyncio.wait_for(self._intent_wakeup.wait(), INTENT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def _claim_pending_payment(self) -> Optional[PendingPayment]:
+        """Mark the oldest queued payment as PROCESSING and return it, or None if none is free"""
+        next_queued = (
+            select(PendingPayment.id)
+            .where(PendingPayment.status == PendingPaymentStatus.QUEUED)
+            .order_by(PendingPayment.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with async_session_maker() as session:
+            result = await session.execute(
+                update(PendingPayment)
+                .where(PendingPayment.id == next_queued)
+                .values(status=PendingPaymentStatus.PROCESSING)
+                .returning(PendingPayment)
+            )
+            pending = result.scalar_one_or_none()
+            await session.commit()
+        return pending
+    
+    async def _create_queued_intent(self, pending: PendingPayment) -> None:
+        """Create the PaymentIntent for a claimed payment and store the outcome"""
+        payment = await self.process_payment(
+            pending.amount,
+            pending.currency,
+            pending.reference,
+            json.loads(pending.payment_metadata) if pending.payment_metadata else None
+        )
+        
+        async with async_session_maker() as session:
+            await session.execute(
+                update(PendingPayment)
+                .where(PendingPayment.id == pending.id)
+                .values(
+                    status=PendingPaymentStatus.CREATED if payment.success else PendingPaymentStatus.FAILED,
+                    transaction_id=payment.transaction_id,
+                    error_code=payment.error_code,
+                    error_message=None if payment.success else payment.message
+                )
+            )
+            await session.commit()
+    
+    async def verify_pending_payment(self, pending_id: int) -> PaymentResult:
+        """Get the status of a payment queued with enqueue_payment"""
+        async with async_session_maker() as session:
+            pending = await session.get(PendingPayment, pending_id)
+        
+        if pending is None:
+            return PaymentResult(
+                success=False,
+                message="Pending payment not found",
+                error_code="TRANSACTION_NOT_FOUND"
+            )
+        if pending.status == PendingPaymentStatus.CREATED:
+            return await self.verify_payment(pending.transaction_id)
+        if pending.status == PendingPaymentStatus.FAILED:
+            return PaymentResult(
+                success=False,
+                message=pending.error_message,
+                error_code=pending.error_code
+            )
+        
+        return PaymentResult(
+            success=True,
+            status="pending",
+            message="Payment is queued for creation",
+            provider_data={"pending_payment_id": str(pending_id)}
+        )
+    
     async def refund_payment(
         self,
         transaction_id: str,
@@ -166,7 +580,7 @@ class StripePaymentProvider(PaymentProviderBase):
         reason: Optional[str] = None
     ) -> PaymentResult:
         """Process a refund via Stripe"""
-        if not stripe.api_key:
+        if self._client is None:
             return PaymentResult(
                 success=False,
                 message="Stripe not configured",
@@ -182,9 +596,16 @@ class StripePaymentProvider(PaymentProviderBase):
             
             # Add amount if specified (partial refund)
             if amount:
-                refund_params["amount"] = int(amount * 100)
+                refund_params["amount"] = _to_minor_units(amount)
             
-            refund = stripe.Refund.create(**refund_params)
+            # One key per refund call, reused across retries. It can't be derived
+            # from the intent and amount: two partial refunds of the same amount
+            # are distinct refunds and must both go through.
+            options = {"idempotency_key": uuid.uuid4().hex}
+            refund = await self._with_retry(
+                lambda: self._client.v1.refunds.create_async(params=refund_params, options=options),
+                self._write_limiter
+            )
             
             return PaymentResult(
                 success=True,
@@ -193,7 +614,7 @@ class StripePaymentProvider(PaymentProviderBase):
                 message="Refund processed successfully",
                 provider_data={
                     "original_transaction": transaction_id,
-                    "refund_amount": float(amount) if amount else "full",
+                    "refund_amount": str(amount) if amount else "full",
                     "status": refund.status
                 }
             )
@@ -204,52 +625,201 @@ class StripePaymentProvider(PaymentProviderBase):
                 message=f"Refund failed: {str(e)}",
                 error_code="REFUND_FAILED"
             )
+        except CircuitOpenError:
+            return self._unavailable()
     
     async def verify_payment(self, transaction_id: str) -> PaymentResult:
         """Verify Stripe payment status"""
-        if not stripe.api_key:
+        if self._client is None:
             return PaymentResult(
                 success=False,
                 message="Stripe not configured",
                 error_code="STRIPE_NOT_CONFIGURED"
             )
         
-        try:
-            payment_intent = stripe.PaymentIntent.retrieve(transaction_id)
-            
-            # Map Stripe status to our status
-            status_map = {
-                "succeeded": "completed",
-                "processing": "pending",
-                "requires_payment_method": "pending",
-                "requires_confirmation": "pending",
-                "requires_action": "pending",
-                "canceled": "cancelled",
-            }
+        cached = self._cached_verification(transaction_id)
+        if cached is not None:
+            return cached
+        
+        lock = self._verify_locks.get(transaction_id)
+        if lock is None:
+            lock = self._verify_locks[transaction_id] = asyncio.Lock()
+        
+        async with lock:
+            # Another caller may have fetched it while we waited
+            cached = self._cached_verification(transaction_id)
+            if cached is not None:
+                return cached
             
-            return PaymentResult(
-                success=True,
-                transaction_id=transaction_id,
-                status=status_map.get(payment_intent.status, payment_intent.status),
-                message=f"Payment status: {payment_intent.status}",
-                provider_data={
-                    "amount": payment_intent.amount / 100,
-                    "currency": payment_intent.currency,
-                    "status": payment_intent.status,
-                    "created": datetime.fromtimestamp(payment_intent.created).isoformat()
-                }
+            result = (
+                await self._local_verification(transaction_id)
+                or await self._retrieve_payment(transaction_id)
+            )
+            if result.success:
+                if result.provider_data["status"] in FINAL_PAYMENT_INTENT_STATUSES:
+                    self._verify_final_cache[transaction_id] = result
+                else:
+                    self._verify_cache[transaction_id] = result
+            return result
+    
+    async def verify_payments_bulk(self, transaction_ids: List[str]) -> List[PaymentResult]:
+        """
+        Verify many payments concurrently
+        
+        Stripe's list API cannot filter by PaymentIntent ID, so lookups are
+        fanned out with bounded concurrency. Results are in input order.
+        """
+        semaphore = asyncio.Semaphore(VERIFY_BULK_CONCURRENCY)
+        
+        async def verify_one(transaction_id: str) -> PaymentResult:
+            async with semaphore:
+                return await self.verify_payment(transaction_id)
+        
+        return list(await asyncio.gather(*(verify_one(tid) for tid in transaction_ids)))
+    
+    def _cached_verification(self, transaction_id: str) -> Optional[PaymentResult]:
+        """Look up a recent verify_payment result"""
+        return (
+            self._verify_final_cache.get(transaction_id)
+            or self._verify_cache.get(transaction_id)
+        )
+    
+    async def _retrieve_payment(self, transaction_id: str) -> PaymentResult:
+        """Fetch a PaymentIntent from Stripe and map it to a PaymentResult"""
+        try:
+            payment_intent = await self._with_retry(
+                lambda: self._client.v1.payment_intents.retrieve_async(transaction_id),
+                self._read_limiter
             )
-            
         except stripe.error.InvalidRequestError:
             return PaymentResult(
                 success=False,
                 message="Transaction not found",
                 error_code="TRANSACTION_NOT_FOUND"
             )
+        except CircuitOpenError:
+            return self._unavailable()
+        
+        # Backfill local state, e.g. for intents created before webhooks were set up
+        try:
+            await self._record_intent(payment_intent, datetime.now(timezone.utc))
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not record PaymentIntent {transaction_id}: {e}")
+        
+        return self._payment_result(
+            transaction_id,
+            payment_intent.status,
+            payment_intent.amount,
+            payment_intent.currency,
+            datetime.fromtimestamp(payment_intent.created, timezone.utc)
+        )
+    
+    async def _local_verification(self, transaction_id: str) -> Optional[PaymentResult]:
+        """Answer verify_payment from webhook-fed local state, if it is current enough"""
+        try:
+            async with async_session_maker() as session:
+                row = await session.get(PaymentIntentStatus, transaction_id)
+        except SQLAlchemyError as e:
+            logger.warning(f"Local payment status lookup failed for {transaction_id}: {e}")
+            return None
+        
+        if row is None:
+            return None
+        age = datetime.now(timezone.utc) - row.updated_at
+        if row.status not in FINAL_PAYMENT_INTENT_STATUSES and age > timedelta(seconds=LOCAL_STATUS_MAX_AGE_SECONDS):
+            return None
+        
+        return self._payment_result(
+            transaction_id, row.status, row.amount, row.currency, row.intent_created_at
+        )
+    
+    def _payment_result(
+        self,
+        transaction_id: str,
+        intent_status: str,
+        amount: int,
+        currency: str,
+        created_at: datetime
+    ) -> PaymentResult:
+        """Map a PaymentIntent's state to a verify_payment result"""
+        return PaymentResult(
+            success=True,
+            transaction_id=transaction_id,
+            status=PAYMENT_INTENT_STATUS_MAP.get(intent_status, intent_status),
+            message=f"Payment status: {intent_status}",
+            provider_data={
+                "amount": str((Decimal(amount) / 100).quantize(Decimal("0.01"))),
+                "currency": currency,
+                "status": intent_status,
+                "created": created_at.isoformat()
+            }
+        )
+    
+    async def _record_intent(self, payment_intent: Any, event_created_at: datetime) -> None:
+        """Store a PaymentIntent's state unless a newer event has already been recorded"""
+        stmt = pg_insert(PaymentIntentStatus).values(
+            intent_id=payment_intent.id,
+            status=payment_intent.status,
+            amount=payment_intent.amount,
+            currency=payment_intent.currency,
+            intent_created_at=datetime.fromtimestamp(payment_intent.created, timezone.utc),
+            event_created_at=event_created_at
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PaymentIntentStatus.intent_id],
+            set_={
+                "status": stmt.excluded.status,
+                "amount": stmt.excluded.amount,
+                "event_created_at": stmt.excluded.event_created_at,
+                "updated_at": func.now()
+            },
+            where=PaymentIntentStatus.event_created_at <= stmt.excluded.event_created_at
+        )
+        async with async_session_maker() as session:
+            await session.execute(stmt)
+            await session.commit()
+    
+    async def handle_webhook(self, payload: bytes, signature: str) -> None:
+        """
+        Apply a Stripe webhook event to the local payment state
+        
+        Args:
+            payload: Raw request body, exactly as received
+            signature: Value of the Stripe-Signature header
+            
+        Raises:
+            ValueError: If webhooks are not configured or the event fails
+                signature verification
+        """
+        webhook_secret = self.config.config.get("webhook_secret")
+        if self._client is None or not webhook_secret:
+            raise ValueError("Stripe webhooks are not configured")
+        
+        try:
+            event = self._client.construct_event(payload, signature, webhook_secret)
+        except stripe.error.SignatureVerificationError as e:
+            raise ValueError(f"Invalid Stripe signature: {e}")
+        
+        if not event.type.startswith("payment_intent."):
+            return
+        
+        payment_intent = event.data.object
+        await self._record_intent(payment_intent, datetime.fromtimestamp(event.created, timezone.utc))
+        
+        # Drop this process's cached result so the next verify sees the new state
+        self._verify_cache.pop(payment_intent.id, None)
+        self._verify_final_cache.pop(payment_intent.id, None)
     
     def is_available(self) -> bool:
         """Check if Stripe is configured"""
-        return stripe.api_key is not None
+        return self._client is not None
+    
+    async def aclose(self) -> None:
+        """Stop the intent workers and close pooled connections to Stripe"""
+        for task in self._intent_workers:
+            task.cancel()
+        if self._http_client is not None:
+            await self._http_client.close_async()
     
     async def create_checkout_session(
         self,
@@ -265,7 +835,7 @@ class StripePaymentProvider(PaymentProviderBase):
         
         This provides a pre-built payment page hosted by Stripe.
         """
-        if not stripe.api_key:
+        if self._client is None:
             return PaymentResult(
                 success=False,
                 message="Stripe not configured",
@@ -273,23 +843,24 @@ class StripePaymentProvider(PaymentProviderBase):
             )
         
         try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=["card", "upi"],
-                line_items=[{
+            options = {"idempotency_key": uuid.uuid4().hex}
+            session = await self._with_retry(lambda: self._client.v1.checkout.sessions.create_async(params={
+                "payment_method_types": ["card", "upi"],
+                "line_items": [{
                     "price_data": {
                         "currency": currency.lower(),
                         "product_data": {
                             "name": product_name,
                         },
-                        "unit_amount": int(amount * 100),
+                        "unit_amount": _to_minor_units(amount),
                     },
                     "quantity": 1,
                 }],
-                mode="payment",
-                success_url=success_url,
-                cancel_url=cancel_url,
-                metadata=metadata or {}
-            )
+                "mode": "payment",
+                "success_url": success_url,
+                "cancel_url": cancel_url,
+                "metadata": metadata or {}
+            }, options=options), self._write_limiter)
             
             return PaymentResult(
                 success=True,
@@ -302,6 +873,8 @@ class StripePaymentProvider(PaymentProviderBase):
                 }
             )
             
+        except CircuitOpenError:
+            return self._unavailable()
         except Exception as e:
             return PaymentResult(
                 success=False,
@@ -16,10 +16,11 @@ from datetime import datetime
 import uuid
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, func, update, lambda_stmt, and_, or_
+from sqlalchemy.orm import aliased, joinedload
 
 from app.db.database import get_db
+from app.db.pagination import fetch_page
 from app.models.models import (
     Payment, FeeRecord, FeeStructure, Student, User, UserProfile,
     AcademicYear, PaymentStatus, FeeStatus, PaymentMethod
@@ -31,11 +32,19 @@ from app.schema.payment_schema import (
 from app.services.payment_gateway.base import (
     PaymentProviderType, PaymentResult
 )
-from app.services.payment_gateway.manual_provider import (
-    ManualPaymentProvider, BankTransferProvider
-)
-from app.services.payment_gateway.stripe_provider import StripePaymentProvider
-from app.services.receipt_service import ReceiptGenerator
+from app.services.payment_gateway.registry import get_provider
+from app.services.receipt_service import receipt_generator
+
+
+# Payment method -> provider that handles it
+PROVIDER_TYPE_BY_METHOD: Dict[PaymentMethod, PaymentProviderType] = {
+    PaymentMethod.CASH: PaymentProviderType.MANUAL,
+    PaymentMethod.CHEQUE: PaymentProviderType.MANUAL,
+    PaymentMethod.BANK_TRANSFER: PaymentProviderType.BANK,
+    PaymentMethod.CARD: PaymentProviderType.STRIPE,
+    PaymentMethod.UPI: PaymentProviderType.STRIPE,
+    PaymentMethod.ONLINE: PaymentProviderType.STRIPE,
+}
 
 
 class PaymentService:
@@ -49,34 +58,18 @@ class PaymentService:
     - Receipt generation
     """
     
-    # Provider mapping
-    PROVIDERS = {
-        PaymentProviderType.MANUAL: ManualPaymentProvider(),
-        PaymentProviderType.BANK: BankTransferProvider(),
-        PaymentProviderType.STRIPE: StripePaymentProvider(),
-        PaymentProviderType.RAZORPAY: None,  # TODO: Implement
-    }
-    
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.receipt_generator = ReceiptGenerator()
+        # Shared instance: building the ReportLab stylesheet per request is wasted work
+        self.receipt_generator = receipt_generator
     
     def _get_provider(self, method: PaymentMethod) -> Optional[Any]:
         """
         Get the appropriate payment provider for the method.
         """
-        provider_type_map = {
-            PaymentMethod.CASH: PaymentProviderType.MANUAL,
-            PaymentMethod.CHEQUE: PaymentProviderType.MANUAL,
-            PaymentMethod.BANK_TRANSFER: PaymentProviderType.BANK,
-            PaymentMethod.CARD: PaymentProviderType.STRIPE,
-            PaymentMethod.UPI: PaymentProviderType.STRIPE,
-            PaymentMethod.ONLINE: PaymentProviderType.STRIPE,
-        }
-        
-        provider_type = provider_type_map.get(method)
+        provider_type = PROVIDER_TYPE_BY_METHOD.get(method)
         if provider_type:
-            return self.PROVIDERS.get(provider_type)
+            return get_provider(provider_type)
         return None
     
     def _generate_receipt_number(self) -> str:
@@ -107,19 +100,23 @@ class PaymentService:
         Returns:
             PaymentApiResponse with payment details
         """
-        # Get fee record
-        result = await self.db.execute(
-            select(FeeRecord)
-            .options(selectinload(FeeRecord.fee_structure))
+        # Get fee record, student and the student's first name in one round-trip;
+        # the outer joins leave the student columns NULL if the student is missing
+        result = await self.db.execute(lambda_stmt(
+            lambda: select(FeeRecord, Student.id, UserProfile.first_name)
+            .select_from(FeeRecord)
+            .outerjoin(Student, Student.id == student_id)
+            .outerjoin(UserProfile, UserProfile.user_id == Student.user_id)
             .where(FeeRecord.id == fee_record_id)
-        )
-        fee_record = result.scalar_one_or_none()
+        ))
+        row = result.one_or_none()
         
-        if not fee_record:
+        if not row:
             return PaymentApiResponse(
                 success=False,
                 message="Fee record not found"
             )
+        fee_record, found_student_id, first_name = row
         
         # Validate amount
         remaining = fee_record.amount_due - fee_record.amount_paid
@@ -129,15 +126,7 @@ class PaymentService:
                 message=f"Payment amount exceeds due amount. Remaining: ₹{remaining}"
             )
         
-        # Get student info
-        student_result = await self.db.execute(
-            select(Student)
-            .options(selectinload(Student.user).selectinload(User.profile))
-            .where(Student.id == student_id)
-        )
-        student = student_result.scalar_one_or_none()
-        
-        if not student:
+        if found_student_id is None:
             return PaymentApiResponse(
                 success=False,
                 message="Student not found"
@@ -150,7 +139,7 @@ class PaymentService:
             result = await provider.process_payment(
                 amount=amount,
                 currency="INR",
-                reference=f"Fee payment for {student.user.profile.first_name if student.user.profile else 'Student'}",
+                reference=f"Fee payment for {first_name or 'Student'}",
                 metadata={
                     "student_id": student_id,
                     "fee_record_id": fee_record_id
@@ -172,44 +161,50 @@ class PaymentService:
         # Create payment record
         receipt_number = self._generate_receipt_number()
         
-        payment = Payment(
-            fee_record_id=fee_record_id,
-            amount=amount,
-            payment_method=payment_method,
-            transaction_id=transaction_id,
-            receipt_number=receipt_number,
-            status=PaymentStatus.COMPLETED,
-            notes=notes,
-            transaction_reference=transaction_reference
-        )
-        self.db.add(payment)
+        # RETURNING hands back the new ID, so the row needs no refresh
+        result = await self.db.execute(lambda_stmt(
+            lambda: insert(Payment)
+            .values(
+                fee_record_id=fee_record_id,
+                amount=amount,
+                payment_method=payment_method,
+                transaction_id=transaction_id,
+                receipt_number=receipt_number,
+                status=PaymentStatus.COMPLETED,
+                notes=notes,
+                transaction_reference=transaction_reference
+            )
+            .returning(Payment.id)
+        ))
+        payment_id = result.scalar_one()
         
         # Update fee record
         new_amount_paid = fee_record.amount_paid + amount
         new_status = FeeStatus.PAID if new_amount_paid >= fee_record.amount_due else FeeStatus.PARTIAL
+        # Taken outside the lambda: lambda_stmt caches its result and only re-reads closure variables
+        now = datetime.now()
         
-        await self.db.execute(
-            update(FeeRecord)
+        await self.db.execute(lambda_stmt(
+            lambda: update(FeeRecord)
             .where(FeeRecord.id == fee_record_id)
             .values(
                 amount_paid=new_amount_paid,
                 status=new_status,
-                payment_date=datetime.now()
+                payment_date=now
             )
-        )
+        ))
         
         await self.db.commit()
-        await self.db.refresh(payment)
         
         return PaymentApiResponse(
             success=True,
             message="Payment processed successfully",
             data={
-                "payment_id": payment.id,
-                "receipt_number": payment.receipt_number,
-                "transaction_id": payment.transaction_id,
-                "amount_paid": float(payment.amount),
-                "status": payment.status.value
+                "payment_id": payment_id,
+                "receipt_number": receipt_number,
+                "transaction_id": transaction_id,
+                "amount_paid": float(amount),
+                "status": PaymentStatus.COMPLETED.value
             }
         )
     
@@ -225,29 +220,21 @@ class PaymentService:
         """
         Get payment history with filters and pagination.
         """
-        query = select(Payment)
+        # Built from cached lambdas; each combination of filters compiles once
+        query = lambda_stmt(lambda: select(Payment))
         
         if student_id:
-            query = query.join(FeeRecord).where(FeeRecord.student_id == student_id)
+            query += lambda q: q.join(FeeRecord).where(FeeRecord.student_id == student_id)
         if fee_record_id:
-            query = query.where(Payment.fee_record_id == fee_record_id)
+            query += lambda q: q.where(Payment.fee_record_id == fee_record_id)
         if start_date:
-            query = query.where(Payment.payment_date >= start_date)
+            query += lambda q: q.where(Payment.payment_date >= start_date)
         if end_date:
-            query = query.where(Payment.payment_date <= end_date)
-        
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        count_result = await self.db.execute(count_query)
-        total = count_result.scalar()
+            query += lambda q: q.where(Payment.payment_date <= end_date)
         
-        # Apply pagination
-        query = query.order_by(Payment.payment_date.desc())
-        query = query.offset((page - 1) * per_page).limit(per_page)
-        
-        # Execute
-        result = await self.db.execute(query)
-        payments = result.scalars().all()
+        payments, total = await fetch_page(
+            self.db, query, (Payment.payment_date.desc(),), page, per_page
+        )
         
         # Build response
         data = [{
@@ -281,35 +268,42 @@ class PaymentService:
         """
         Generate receipt data for a payment.
         """
-        # Get payment with relationships
+        # Student's fee totals, reached through the payment's own fee record
+        student_fees = aliased(FeeRecord)
+        paid_fee = aliased(FeeRecord)
+        total_paid = (
+            select(func.sum(student_fees.amount_paid))
+            .join(paid_fee, paid_fee.student_id == student_fees.student_id)
+            .where(paid_fee.id == Payment.fee_record_id)
+            .scalar_subquery()
+        )
+        balance = (
+            select(func.sum(student_fees.amount_due - student_fees.amount_paid))
+            .join(paid_fee, paid_fee.student_id == student_fees.student_id)
+            .where(paid_fee.id == Payment.fee_record_id)
+            .scalar_subquery()
+        )
+        
+        # Single row by primary key, so joined loads fetch everything in one round-trip
         result = await self.db.execute(
-            select(Payment)
+            select(Payment, total_paid, balance)
             .options(
-                selectinload(Payment.fee_record).selectinload(FeeRecord.fee_structure),
-                selectinload(Payment.fee_record).selectinload(FeeRecord.student)
-                .selectinload(Student.user).selectinload(User.profile)
+                joinedload(Payment.fee_record).joinedload(FeeRecord.fee_structure),
+                joinedload(Payment.fee_record).joinedload(FeeRecord.student)
+                .joinedload(Student.user).joinedload(User.profile)
             )
             .where(Payment.id == payment_id)
         )
-        payment = result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not payment:
+        if not row:
             return None
         
+        payment = row[0]
         student = payment.fee_record.student
         profile = student.user.profile
-        
-        # Calculate totals
-        result2 = await self.db.execute(
-            select(
-                func.sum(FeeRecord.amount_paid).label("total_paid"),
-                func.sum(FeeRecord.amount_due - FeeRecord.amount_paid).label("balance")
-            )
-            .where(FeeRecord.student_id == student.id)
-        )
-        totals = result2.one()
-        total_paid = totals.total_paid or Decimal("0")
-        balance_due = totals.balance or Decimal("0")
+        total_paid = row[1] or Decimal("0")
+        balance_due = row[2] or Decimal("0")
         
         return ReceiptResponse(
             receipt_number=payment.receipt_number,
@@ -344,46 +338,42 @@ class PaymentService:
         
         overdue_date = datetime.now().date() - timedelta(days=days_overdue)
         
+        # Filter and total the overdue fees in SQL so only defaulters come back
+        total_due = func.sum(FeeRecord.amount_due - FeeRecord.amount_paid).label("total_due")
         result = await self.db.execute(
-            select(Student)
-            .options(
-                selectinload(Student.user).selectinload(User.profile),
-                selectinload(Student.fee_records)
+            select(
+                Student.id,
+                Student.admission_number,
+                UserProfile.first_name,
+                UserProfile.last_name,
+                total_due,
+                func.count(FeeRecord.id).label("overdue_fees_count")
             )
+            .join(FeeRecord, FeeRecord.student_id == Student.id)
+            .outerjoin(UserProfile, UserProfile.user_id == Student.user_id)
             .where(
                 and_(
                     Student.school_id == school_id,
-                    Student.status == "active"
+                    Student.status == "active",
+                    FeeRecord.status.in_([FeeStatus.PENDING, FeeStatus.OVERDUE]),
+                    FeeRecord.due_date < overdue_date
                 )
             )
+            .group_by(Student.id, UserProfile.first_name, UserProfile.last_name)
+            .order_by(total_due.desc())
         )
-        students = result.scalars().all()
         
-        defaulters = []
-        for student in students:
-            overdue_fees = [
-                fr for fr in student.fee_records
-                if fr.status in [FeeStatus.PENDING, FeeStatus.OVERDUE]
-                and fr.due_date and fr.due_date < overdue_date
-            ]
-            
-            if overdue_fees:
-                total_due = sum(
-                    fr.amount_due - fr.amount_paid
-                    for fr in overdue_fees
-                )
-                profile = student.user.profile
-                
-                defaulters.append({
-                    "student_id": student.id,
-                    "student_name": f"{profile.first_name} {profile.last_name}" if profile else "Unknown",
-                    "admission_number": student.admission_number,
-                    "total_due": float(total_due),
-                    "overdue_fees_count": len(overdue_fees),
-                    "days_overdue": days_overdue
-                })
-        
-        return sorted(defaulters, key=lambda x: x["total_due"], reverse=True)
+        return [
+            {
+                "student_id": row.id,
+                "student_name": f"{row.first_name} {row.last_name}" if row.first_name else "Unknown",
+                "admission_number": row.admission_number,
+                "total_due": float(row.total_due),
+                "overdue_fees_count": row.overdue_fees_count,
+                "days_overdue": days_overdue
+            }
+            for row in result
+        ]
 
 
 # Dependency factory
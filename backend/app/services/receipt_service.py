@@ -25,6 +25,55 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.platypus.flowables import HRFlowable
 
 
+# Receipt palette
+_NAVY = colors.HexColor("#1a365d")
+_SLATE = colors.HexColor("#2d3748")
+_LABEL_GREY = colors.HexColor("#4a5568")
+_RULE_GREY = colors.HexColor("#e2e8f0")
+_HEADER_BG = colors.HexColor("#f7fafc")
+
+# Table styles are identical for every receipt, so they are built once
+_LOGO_TABLE_STYLE = TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER")])
+
+_INFO_TABLE_STYLE = TableStyle([
+    ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+    ("FONTNAME", (1, 0), (1, -1), "Helvetica-Bold"),
+    ("FONTNAME", (3, 0), (3, -1), "Helvetica-Bold"),
+    ("TEXTCOLOR", (0, 0), (0, -1), _LABEL_GREY),
+    ("TEXTCOLOR", (2, 0), (2, -1), _LABEL_GREY),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
+])
+
+_FEE_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), _HEADER_BG),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+    ("TEXTCOLOR", (0, 0), (-1, 0), _LABEL_GREY),
+    ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+    ("TOPPADDING", (0, 0), (-1, -1), 8),
+    ("GRID", (0, 0), (-1, -1), 0.5, _RULE_GREY),
+])
+
+_TOTAL_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, -1), _NAVY),
+    ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 12),
+    ("TEXTCOLOR", (0, 0), (-1, -1), colors.white),
+    ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
+    ("TOPPADDING", (0, 0), (-1, -1), 10),
+])
+
+_PAYMENT_TABLE_STYLE = TableStyle([
+    ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+    ("TEXTCOLOR", (0, 0), (0, -1), _LABEL_GREY),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+])
+
+
 class ReceiptGenerator:
     """
     PDF Receipt Generator using ReportLab.
@@ -55,7 +104,7 @@ class ReceiptGenerator:
             name="ReceiptTitle",
             parent=self.styles["Heading1"],
             fontSize=18,
-            textColor=colors.HexColor("#1a365d"),
+            textColor=_NAVY,
             alignment=1,  # Center
             spaceAfter=20
         ))
@@ -64,7 +113,7 @@ class ReceiptGenerator:
             name="ReceiptHeader",
             parent=self.styles["Heading2"],
             fontSize=14,
-            textColor=colors.HexColor("#2d3748"),
+            textColor=_SLATE,
             spaceBefore=10,
             spaceAfter=8
         ))
@@ -81,7 +130,7 @@ class ReceiptGenerator:
             name="ReceiptLabel",
             parent=self.styles["Normal"],
             fontSize=10,
-            textColor=colors.HexColor("#4a5568"),
+            textColor=_LABEL_GREY,
         ))
         
         self.styles.add(ParagraphStyle(
@@ -145,7 +194,7 @@ class ReceiptGenerator:
             logo = ImageReader(school_logo_path)
             aspect = logo.getSize()[0] / logo.getSize()[1]
             logo_table = Table([[Paragraph(f"<img src='{school_logo_path}' width='{50*mm}' height='{50*mm/aspect}'/>")]], colWidths=[100*mm])
-            logo_table.setStyle(TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER")]))
+            logo_table.setStyle(_LOGO_TABLE_STYLE)
             story.append(logo_table)
             story.append(Spacer(1, 10))
         
@@ -153,7 +202,7 @@ class ReceiptGenerator:
         if self.school_address:
             story.append(Paragraph(self.school_address, self.styles["ReceiptBody"]))
         
-        story.append(HRFlowable(width="100%", thickness=2, color=colors.HexColor("#1a365d")))
+        story.append(HRFlowable(width="100%", thickness=2, color=_NAVY))
         story.append(Spacer(1, 15))
         
         # Receipt Title
@@ -167,15 +216,7 @@ class ReceiptGenerator:
         ]
         
         info_table = Table(receipt_info, colWidths=[40*mm, 50*mm, 30*mm, 50*mm])
-        info_table.setStyle(TableStyle([
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-            ("FONTNAME", (1, 0), (1, -1), "Helvetica-Bold"),
-            ("FONTNAME", (3, 0), (3, -1), "Helvetica-Bold"),
-            ("TEXTCOLOR", (0, 0), (0, -1), colors.HexColor("#4a5568")),
-            ("TEXTCOLOR", (2, 0), (2, -1), colors.HexColor("#4a5568")),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
-        ]))
+        info_table.setStyle(_INFO_TABLE_STYLE)
         story.append(info_table)
         story.append(Spacer(1, 20))
         
@@ -186,7 +227,7 @@ class ReceiptGenerator:
         
         # Payment Details Header
         story.append(Paragraph("PAYMENT DETAILS", self.styles["ReceiptHeader"]))
-        story.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor("#e2e8f0")))
+        story.append(HRFlowable(width="100%", thickness=1, color=_RULE_GREY))
         story.append(Spacer(1, 10))
         
         # Fee Details
@@ -202,30 +243,13 @@ class ReceiptGenerator:
             ])
         
         fee_table = Table(fee_details, colWidths=[80*mm, 40*mm])
-        fee_table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f7fafc")),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#4a5568")),
-            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-            ("TOPPADDING", (0, 0), (-1, -1), 8),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#e2e8f0")),
-        ]))
+        fee_table.setStyle(_FEE_TABLE_STYLE)
         story.append(fee_table)
         story.append(Spacer(1, 15))
         
         # Total Amount
         total_table = Table([["TOTAL PAID", f"₹{float(amount_paid):.2f}"]], colWidths=[100*mm, 40*mm])
-        total_table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#1a365d")),
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, -1), 12),
-            ("TEXTCOLOR", (0, 0), (-1, -1), colors.white),
-            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
-            ("TOPPADDING", (0, 0), (-1, -1), 10),
-        ]))
+        total_table.setStyle(_TOTAL_TABLE_STYLE)
         story.append(total_table)
         story.append(Spacer(1, 15))
         
@@ -237,17 +261,12 @@ class ReceiptGenerator:
             payment_info.append(["Reference No.:", transaction_reference])
         
         payment_table = Table(payment_info, colWidths=[50*mm, 80*mm])
-        payment_table.setStyle(TableStyle([
-            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 0), (-1, -1), 10),
-            ("TEXTCOLOR", (0, 0), (0, -1), colors.HexColor("#4a5568")),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
-        ]))
+        payment_table.setStyle(_PAYMENT_TABLE_STYLE)
         story.append(payment_table)
         story.append(Spacer(1, 30))
         
         # Footer
-        story.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor("#e2e8f0")))
+        story.append(HRFlowable(width="100%", thickness=1, color=_RULE_GREY))
         story.append(Spacer(1, 10))
         
         story.append(Paragraph("This is a computer-generated receipt.", self.styles["ReceiptBody"]))
@@ -0,0 +1,55 @@
+"""
+SMS Encoding Helpers
+
+Segment counting for outgoing SMS. Carriers bill per segment, and the
+segment size depends on whether the text fits the GSM-7 alphabet:
+
+- GSM-7: 160 characters in a single SMS, 153 per part when concatenated
+- UCS-2: 70 UTF-16 code units in a single SMS, 67 per part when concatenated
+"""
+
+from math import ceil
+from typing import Tuple
+
+
+# GSM 03.38 basic character set
+GSM7_BASIC_CHARS = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+# GSM 03.38 extension table; each character takes two septets (escape + char)
+GSM7_EXTENDED_CHARS = frozenset("^{}\\[~]|€\f")
+
+GSM7_SINGLE_LIMIT = 160
+GSM7_MULTIPART_LIMIT = 153
+UCS2_SINGLE_LIMIT = 70
+UCS2_MULTIPART_LIMIT = 67
+
+
+def is_gsm7(text: str) -> bool:
+    """Check whether text can be sent with the GSM-7 alphabet"""
+    return all(c in GSM7_BASIC_CHARS or c in GSM7_EXTENDED_CHARS for c in text)
+
+
+def count_segments(text: str) -> Tuple[int, int]:
+    """
+    Count the encoded length and SMS segments for a message
+
+    Args:
+        text: Message content
+
+    Returns:
+        Tuple of (encoded length, segment count). The length is in
+        septets for GSM-7 and UTF-16 code units for UCS-2.
+    """
+    if is_gsm7(text):
+        units = len(text) + sum(1 for c in text if c in GSM7_EXTENDED_CHARS)
+        single_limit, multipart_limit = GSM7_SINGLE_LIMIT, GSM7_MULTIPART_LIMIT
+    else:
+        units = len(text.encode("utf-16-be")) // 2
+        single_limit, multipart_limit = UCS2_SINGLE_LIMIT, UCS2_MULTIPART_LIMIT
+
+    if units <= single_limit:
+        return units, 1
+    return units, ceil(units / multipart_limit)
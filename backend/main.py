@@ -10,7 +10,9 @@ from contextlib import asynccontextmanager
 import logging
 
 from app.schema import schema
-from app.db.database import engine, Base
+from app.db.database import engine, read_engine, Base
+from app.core.cache import close_redis
+from app.services.payment_gateway.registry import close_providers, start_provider_workers
 from app.config import settings
 
 # Configure logging
@@ -30,10 +32,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
         # Continue anyway - tables might already exist
+    start_provider_workers()
     yield
     # Shutdown: Cleanup
     logger.info("Shutting down SchoolOps API...")
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await close_redis()
+    await close_providers()
 
 
 # Create FastAPI app
@@ -1,11 +1,48 @@
 """
 Unit tests for business logic services in SchoolOps Backend
 """
+import os
+import uuid
 import pytest
-from datetime import date, timedelta
+import pytest_asyncio
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.rate_limit import AsyncTokenBucket
+from app.db.database import Base
+from app.db.models import (
+    User, UserProfile, BookCatalog, LibraryMember, BookTransaction,
+    MemberType, TransactionStatus
+)
+from app.models.models import PaymentMethod, UserRole
+from app.schema.library_schema import BookIssueRequest, BookReturnRequest
 from app.services.attendance_service import AttendanceService
 from app.services.grade_service import GradeService
 from app.services.fee_service import FeeService
+from app.services.library_service import LibraryService
+from app.services.payment_service import PaymentService
+
+
+def _mock_session():
+    """AsyncSession stand-in whose statement results each test scripts"""
+    db = MagicMock()
+    db.execute = AsyncMock()
+    db.scalar = AsyncMock()
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    db.refresh = AsyncMock()
+    return db
+
+
+def _result(**returns):
+    """Result object whose accessor methods return the given values"""
+    result = MagicMock()
+    for method, value in returns.items():
+        getattr(result, method).return_value = value
+    return result
 
 
 class TestAttendanceService:
@@ -94,7 +131,7 @@ class TestGradeService:
         grades = [
             {"grade": "A", "credit_hours": 4},
             {"grade": "B+", "credit_hours": 3},
-            {"grade": "A-", "credit_hours":": 3},
+            {"grade": "A-", "credit_hours": 3},
             {"grade": "B", "credit_hours": 4},
         ]
         
@@ -240,3 +277,319 @@ class TestFeeService:
         assert "total_due" in analysis
         assert "collection_rate" in analysis
         assert "fee_type_breakdown" in analysis
+
+
+class TestLibraryIssueGuard:
+    """Tests for the availability and borrowing-limit checks in issue_book."""
+    
+    @staticmethod
+    def _request():
+        return BookIssueRequest(book_id=uuid.uuid4(), member_id=uuid.uuid4())
+    
+    @staticmethod
+    def _member(**overrides):
+        fields = dict(
+            id=uuid.uuid4(), can_borrow=True, max_books=3, max_days=14,
+            suspension_end_date=None, user=None, card_number="LIB-2024-00001"
+        )
+        fields.update(overrides)
+        return SimpleNamespace(**fields)
+    
+    async def test_book_with_no_copies_left_is_refused(self):
+        """Test that a book with no available copies cannot be issued."""
+        db = _mock_session()
+        book = SimpleNamespace(id=uuid.uuid4(), title="Dune", available_copies=0)
+        db.execute.return_value = _result(one_or_none=(book, None, None))
+        
+        with pytest.raises(ValueError, match="'Dune' is not available"):
+            await LibraryService(db).issue_book(self._request())
+        
+        db.scalar.assert_not_awaited()
+        db.add.assert_not_called()
+    
+    async def test_member_at_max_books_is_refused(self):
+        """Test that a member who has reached max_books cannot borrow."""
+        db = _mock_session()
+        book = SimpleNamespace(id=uuid.uuid4(), title="Dune", available_copies=2)
+        db.execute.side_effect = [
+            _result(one_or_none=(book, None, None)),
+            _result(scalar_one_or_none=self._member(can_borrow=False)),
+        ]
+        
+        with pytest.raises(ValueError, match=r"maximum book limit \(3\)"):
+            await LibraryService(db).issue_book(self._request())
+        
+        db.scalar.assert_not_awaited()
+        db.add.assert_not_called()
+    
+    async def test_last_copy_taken_concurrently_is_refused(self):
+        """Test that the guarded decrement refuses a copy taken since the read."""
+        db = _mock_session()
+        book = SimpleNamespace(id=uuid.uuid4(), title="Dune", available_copies=1)
+        db.execute.side_effect = [
+            _result(one_or_none=(book, None, None)),
+            _result(scalar_one_or_none=self._member()),
+        ]
+        # UPDATE ... WHERE available_copies > 0 matched no row
+        db.scalar.side_effect = [None]
+        
+        with pytest.raises(ValueError, match="'Dune' is not available"):
+            await LibraryService(db).issue_book(self._request())
+        
+        db.rollback.assert_awaited_once()
+        db.add.assert_not_called()
+    
+    async def test_max_books_reached_concurrently_is_refused(self):
+        """Test that the guarded member increment refuses a loan past max_books."""
+        db = _mock_session()
+        book = SimpleNamespace(id=uuid.uuid4(), title="Dune", available_copies=1)
+        db.execute.side_effect = [
+            _result(one_or_none=(book, None, None)),
+            _result(scalar_one_or_none=self._member()),
+        ]
+        # The copy was taken, then UPDATE ... WHERE current_issues < max_books matched no row
+        db.scalar.side_effect = [0, None]
+        
+        with pytest.raises(ValueError, match=r"maximum book limit \(3\)"):
+            await LibraryService(db).issue_book(self._request())
+        
+        db.rollback.assert_awaited_once()
+        db.add.assert_not_called()
+
+
+@pytest_asyncio.fixture
+async def pg_session():
+    """
+    Session on a real PostgreSQL database
+    
+    Loans are closed with SQL date arithmetic, so these tests need the real
+    dialect; they are skipped unless TEST_POSTGRES_URL is set.
+    """
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL not set")
+    
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            yield session
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+class TestLibraryClosingFine:
+    """Tests that fines computed when closing a loan match BookTransaction.calculate_fine()."""
+    
+    @staticmethod
+    async def _overdue_loan(db, days_overdue: int) -> BookTransaction:
+        """Seed one book on loan to one member, due `days_overdue` days ago"""
+        user = User(email="reader@schoolops.test", password_hash="x", role=UserRole.PARENT)
+        db.add(user)
+        await db.flush()
+        db.add(UserProfile(user_id=user.id, first_name="Test", last_name="Reader"))
+        book = BookCatalog(
+            isbn="9780441013593", title="Dune", author="Frank Herbert",
+            total_copies=1, available_copies=0
+        )
+        member = LibraryMember(
+            user_id=user.id, member_type=MemberType.STUDENT,
+            card_number="LIB-2024-00001", current_issues=1
+        )
+        db.add_all([book, member])
+        await db.flush()
+        
+        # A few hours past the whole days so the count is not on a day boundary
+        due_date = datetime.utcnow() - timedelta(days=days_overdue, hours=3)
+        transaction = BookTransaction(
+            book_id=book.id, member_id=member.id,
+            issue_date=due_date - timedelta(days=14), due_date=due_date,
+            status=TransactionStatus.ISSUED, fine_per_day=Decimal("2.00")
+        )
+        db.add(transaction)
+        await db.commit()
+        # Start the service from an empty identity map, as a new request would
+        db.expunge_all()
+        return transaction
+    
+    async def test_return_book_fine_matches_calculate_fine(self, pg_session):
+        """Test the fine set by return_book against calculate_fine()."""
+        loan = await self._overdue_loan(pg_session, days_overdue=5)
+        expected = loan.calculate_fine()
+        
+        transaction, receipt = await LibraryService(pg_session).return_book(
+            BookReturnRequest(transaction_id=loan.id)
+        )
+        
+        assert expected == Decimal("10.00")
+        assert transaction.fine_amount == expected
+        assert receipt.fine_amount == expected
+        assert receipt.member_name == "Test Reader"
+        assert transaction.status == TransactionStatus.OVERDUE
+    
+    async def test_bulk_return_fine_matches_calculate_fine(self, pg_session):
+        """Test the fine set by bulk_return against calculate_fine()."""
+        loan = await self._overdue_loan(pg_session, days_overdue=5)
+        expected = loan.calculate_fine()
+        
+        transactions = await LibraryService(pg_session).bulk_return([loan.id])
+        
+        assert len(transactions) == 1
+        assert transactions[0].fine_amount == expected
+        book = await pg_session.get(BookCatalog, loan.book_id, populate_existing=True)
+        member = await pg_session.get(LibraryMember, loan.member_id, populate_existing=True)
+        assert book.available_copies == 1
+        assert member.current_issues == 0
+    
+    async def test_on_time_return_has_no_fine(self, pg_session):
+        """Test that a loan returned before its due date closes without a fine."""
+        loan = await self._overdue_loan(pg_session, days_overdue=-2)
+        
+        transactions = await LibraryService(pg_session).bulk_return([loan.id])
+        
+        assert loan.calculate_fine() == Decimal("0.00")
+        assert transactions[0].fine_amount == Decimal("0.00")
+        assert transactions[0].status == TransactionStatus.RETURNED
+
+
+class TestCircuitBreaker:
+    """Tests for the circuit breaker guarding external services."""
+    
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        """Controllable time.monotonic for the breaker"""
+        now = [1000.0]
+        monkeypatch.setattr("app.core.circuit_breaker.time.monotonic", lambda: now[0])
+        return now
+    
+    def _tripped(self):
+        breaker = CircuitBreaker("stripe", failure_threshold=3, reset_timeout=30.0)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        return breaker
+    
+    def test_opens_after_threshold_failures(self, clock):
+        """Test that consecutive failures open the circuit and reject calls."""
+        breaker = CircuitBreaker("stripe", failure_threshold=3, reset_timeout=30.0)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert not breaker.is_open
+        breaker.before_call()
+        
+        breaker.record_failure()
+        
+        assert breaker.is_open
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+    
+    def test_success_resets_failure_count(self, clock):
+        """Test that a success in between keeps failures from accumulating."""
+        breaker = CircuitBreaker("stripe", failure_threshold=3, reset_timeout=30.0)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        
+        assert not breaker.is_open
+        breaker.before_call()
+    
+    def test_half_open_probe_success_closes(self, clock):
+        """Test that one probe is let through after the timeout and success closes."""
+        breaker = self._tripped()
+        clock[0] += 30.0
+        
+        breaker.before_call()
+        # Only the probe goes through; other calls still fail fast
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        
+        breaker.record_success()
+        
+        assert not breaker.is_open
+        breaker.before_call()
+    
+    def test_half_open_probe_failure_reopens(self, clock):
+        """Test that a failed probe keeps the circuit open for another timeout."""
+        breaker = self._tripped()
+        clock[0] += 30.0
+        breaker.before_call()
+        
+        breaker.record_failure()
+        
+        assert breaker.is_open
+        clock[0] += 29.0
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        clock[0] += 1.0
+        breaker.before_call()
+
+
+class TestAsyncTokenBucket:
+    """Tests for client-side rate limiting."""
+    
+    async def test_burst_up_to_capacity_passes_immediately(self):
+        """Test that a full bucket hands out `capacity` tokens without waiting."""
+        bucket = AsyncTokenBucket(rate=1, capacity=5)
+        
+        start = datetime.now()
+        for _ in range(5):
+            await bucket.acquire()
+        
+        assert (datetime.now() - start).total_seconds() < 0.5
+    
+    async def test_empty_bucket_waits_for_refill(self):
+        """Test that an empty bucket paces callers to the refill rate."""
+        bucket = AsyncTokenBucket(rate=20, capacity=2)
+        await bucket.acquire()
+        await bucket.acquire()
+        
+        start = datetime.now()
+        for _ in range(3):
+            await bucket.acquire()
+        
+        # Three tokens at 20/s take about 0.15s to refill
+        assert (datetime.now() - start).total_seconds() >= 0.12
+    
+    def test_capacity_defaults_to_rate(self):
+        """Test that the burst size defaults to one second of tokens."""
+        assert AsyncTokenBucket(rate=25).capacity == 25
+
+
+class TestProcessPaymentLookup:
+    """Tests for the not-found responses of PaymentService.process_payment."""
+    
+    async def test_missing_fee_record(self):
+        """Test that an unknown fee record is reported as such."""
+        db = _mock_session()
+        db.execute.return_value = _result(one_or_none=None)
+        
+        response = await PaymentService(db).process_payment(
+            student_id=1, fee_record_id=99, amount=Decimal("500"),
+            payment_method=PaymentMethod.CASH
+        )
+        
+        assert not response.success
+        assert response.message == "Fee record not found"
+        db.execute.assert_awaited_once()
+    
+    async def test_missing_student(self):
+        """Test that a known fee record with an unknown student reports the student."""
+        db = _mock_session()
+        fee_record = SimpleNamespace(amount_due=Decimal("1000"), amount_paid=Decimal("0"))
+        # The outer joins leave the student columns NULL
+        db.execute.return_value = _result(one_or_none=(fee_record, None, None))
+        
+        response = await PaymentService(db).process_payment(
+            student_id=99, fee_record_id=1, amount=Decimal("500"),
+            payment_method=PaymentMethod.CASH
+        )
+        
+        assert not response.success
+        assert response.message == "Student not found"
+        # Nothing was recorded
+        db.execute.assert_awaited_once()
+        db.commit.assert_not_awaited()
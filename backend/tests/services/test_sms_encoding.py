@@ -0,0 +1,34 @@
+"""
+Unit tests for SMS segment counting
+"""
+from app.services.sms.encoding import count_segments, is_gsm7
+
+
+class TestSMSSegments:
+    """Tests for GSM-7 / UCS-2 segment counting."""
+
+    def test_gsm7_single_segment_boundary(self):
+        """Test a 160-character GSM-7 message fits in one segment."""
+        assert count_segments("a" * 160) == (160, 1)
+
+    def test_gsm7_multipart_uses_153_per_segment(self):
+        """Test concatenated GSM-7 messages split at 153 characters."""
+        assert count_segments("a" * 161) == (161, 2)
+        assert count_segments("a" * 307) == (307, 3)
+
+    def test_gsm7_extended_chars_count_double(self):
+        """Test extension-table characters take two septets."""
+        assert is_gsm7("Fee: €50 [due]")
+        assert count_segments("€" * 80) == (160, 1)
+        assert count_segments("€" * 81) == (162, 2)
+
+    def test_ucs2_segments(self):
+        """Test non-GSM text uses 70/67 UCS-2 limits."""
+        assert not is_gsm7("नमस्ते")
+        assert count_segments("ш" * 70) == (70, 1)
+        assert count_segments("ш" * 71) == (71, 2)
+
+    def test_ucs2_counts_surrogate_pairs(self):
+        """Test characters outside the BMP count as two code units."""
+        assert count_segments("😀" * 35) == (70, 1)
+        assert count_segments("😀" * 36) == (72, 2)